@@ -2,7 +2,7 @@ import pulumi as p
 import pulumi_kubernetes as k8s
 
 from backup.config import ComponentConfig
-from backup.cronjob import create_backup_cronjob
+from backup.cronjob import create_backup_cronjobs
 
 
 class Backup(p.ComponentResource):
@@ -31,9 +31,10 @@ class Backup(p.ComponentResource):
             parent=self,
         )
 
-        # Create backup CronJob
-        self.cronjob = create_backup_cronjob(component_config, k8s_opts)
+        # Create backup and maintenance CronJobs, one each per volume
+        self.cronjobs = create_backup_cronjobs(component_config, k8s_opts)
 
         # Export useful outputs
-        p.export('backup_cronjob_name', self.cronjob.metadata.name)
+        p.export('backup_cronjob_names', [cronjob.metadata.name for cronjob in self.cronjobs])
         p.export('backup_schedule', component_config.schedule)
+        p.export('backup_maintenance_schedule', component_config.maintenance.schedule)
@@ -1,13 +1,41 @@
+import enum
+
 import pydantic
 import utils.model
 
 
+class ResticCompression(enum.StrEnum):
+    """Compression mode of restic.
+
+    Only `max` spends noticeably more CPU than `auto`, which is wasted on photos, videos and PDFs
+    as these are compressed already. `detect` samples the file types of the volume before each
+    backup and picks `off`, `auto` or `max`.
+    """
+
+    OFF = 'off'
+    AUTO = 'auto'
+    FASTEST = 'fastest'
+    BETTER = 'better'
+    MAX = 'max'
+    DETECT = 'detect'
+
+
 class VolumeConfig(utils.model.LocalBaseModel):
     name: str
     nfs_server: str
     nfs_path: str
     nfs_mount_options: str = 'nfsvers=4.1,sec=sys'
     bucket: str
+    # Falls back to the resources of the component
+    resources: utils.model.ResourcesConfig | None = None
+    compression: ResticCompression = pydantic.Field(default=ResticCompression.MAX)
+    pack_size_mb: pydantic.PositiveInt = pydantic.Field(default=64)
+    # Files read in parallel, restic defaults to 2
+    read_concurrency: pydantic.PositiveInt | None = None
+    # Parallel connections to S3, restic defaults to 5
+    s3_connections: pydantic.PositiveInt | None = None
+    # Upload bandwidth limit in KiB/s
+    limit_upload_kib: pydantic.PositiveInt | None = None
 
     @property
     def mount_path(self) -> str:
@@ -16,6 +44,32 @@ class VolumeConfig(utils.model.LocalBaseModel):
 
 class ResticConfig(utils.model.LocalBaseModel):
     version: str
+    # Persistent cache shared by all repositories, restic keeps one subdirectory per repository
+    cache_size_gb: pydantic.PositiveInt = pydantic.Field(default=10)
+    # Caches of repositories not used for this long are removed
+    cache_max_age_days: pydantic.PositiveInt = pydantic.Field(default=30)
+
+
+class MaintenanceConfig(utils.model.LocalBaseModel):
+    # Weekly, outside of the nightly backup window
+    schedule: str = pydantic.Field(default='0 12 * * 0')
+    # Passed to restic prune, limits how much data is repacked per run
+    max_unused: str = pydantic.Field(default='10%')
+    max_repack_size: str = pydantic.Field(default='2G')
+    # The pack files are read in this many parts, one per run
+    check_subsets: pydantic.PositiveInt = pydantic.Field(default=8)
+
+
+class BenchmarkConfig(utils.model.LocalBaseModel):
+    # Volume to take the sample from, its read concurrency and connections are used
+    volume: str
+    minio_version: str
+    sample_size_mb: pydantic.PositiveInt = pydantic.Field(default=1024)
+    # Every combination is backed up once, `detect` is not supported
+    compressions: list[ResticCompression] = pydantic.Field(
+        default=[ResticCompression.OFF, ResticCompression.AUTO, ResticCompression.MAX]
+    )
+    pack_sizes_mb: list[pydantic.PositiveInt] = pydantic.Field(default=[16, 64])
 
 
 class ComponentConfig(utils.model.LocalBaseModel):
@@ -25,7 +79,14 @@ class ComponentConfig(utils.model.LocalBaseModel):
     retention_weekly: int = pydantic.Field(default=8)
     retention_monthly: int = pydantic.Field(default=12)
     retention_yearly: int = pydantic.Field(default=5)
+    maintenance: MaintenanceConfig = pydantic.Field(default_factory=MaintenanceConfig)
+    # Suspended CronJob comparing restic settings, started by hand
+    benchmark: BenchmarkConfig | None = None
     volumes: list[VolumeConfig]
+    # Volumes backed up at the same time, the rest waits for a free slot
+    max_concurrent_backups: pydantic.PositiveInt = pydantic.Field(default=2)
+    # Backups still running after this are stopped
+    active_deadline_seconds: pydantic.PositiveInt = pydantic.Field(default=6 * 3600)
     resources: utils.model.ResourcesConfig
 
 
@@ -1,38 +1,53 @@
 import pathlib
+import typing as t
 
 import jinja2
 import pulumi as p
 import pulumi_kubernetes as k8s
+import utils.otlp
+import utils.restic
 
-from backup.config import ComponentConfig
+from backup.config import BenchmarkConfig, ComponentConfig, VolumeConfig
 
+# Credentials of the throwaway MinIO of the benchmark, only reachable from within its pod
+_BENCHMARK_MINIO_USER = 'benchmark'
+_BENCHMARK_MINIO_PASSWORD = 'benchmark'
 
-def create_backup_cronjob(
+
+def create_backup_cronjobs(
     component_config: ComponentConfig, k8s_opts: p.ResourceOptions
-) -> k8s.batch.v1.CronJob:
+) -> list[k8s.batch.v1.CronJob]:
+    """Create backup and maintenance CronJobs per volume, sharing scripts, secrets and cache."""
     # Load pulumi secret config
     config = p.Config()
     restic_password = config.require_secret('restic-password')
     s3_config = config.require_object('s3')
 
-    # Load and render backup script template
-    template_path = pathlib.Path(__file__).parent.parent / 'assets' / 'backup.sh.j2'
-    template_env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_path.parent))
-    template = template_env.get_template(template_path.name)
-
-    backup_script_content = template.render(
-        retention_daily=component_config.retention_daily,
-        retention_weekly=component_config.retention_weekly,
-        retention_monthly=component_config.retention_monthly,
-        retention_yearly=component_config.retention_yearly,
-        volumes=component_config.volumes,
+    # Load and render the backup and maintenance script templates
+    template_env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(pathlib.Path(__file__).parent.parent / 'assets')
     )
+    template_context = {
+        'retention_daily': component_config.retention_daily,
+        'retention_weekly': component_config.retention_weekly,
+        'retention_monthly': component_config.retention_monthly,
+        'retention_yearly': component_config.retention_yearly,
+        'maintenance': component_config.maintenance,
+        'cache_max_age_days': component_config.restic.cache_max_age_days,
+        # Leave headroom for the runs writing to the cache at the same time
+        'cache_limit_mb': int(component_config.restic.cache_size_gb * 1024 * 0.8),
+        'push_metrics_functions': utils.otlp.PUSH_METRICS_FUNCTIONS,
+        'restic_summary_functions': utils.restic.RESTIC_SUMMARY_FUNCTIONS,
+    }
 
-    # ConfigMap with backup script
+    # ConfigMap with backup and maintenance scripts
     backup_script_configmap = k8s.core.v1.ConfigMap(
         'backup-script',
         metadata={'name': 'backup-script'},
-        data={'backup.sh': backup_script_content},
+        data={
+            f'{job}.sh': template_env.get_template(f'{job}.sh.j2').render(template_context)
+            for job in ('backup', 'maintenance', 'benchmark')
+        },
         opts=k8s_opts,
     )
 
@@ -58,7 +73,126 @@ def create_backup_cronjob(
         opts=k8s_opts,
     )
 
-    # Prepare volumes and volume mounts
+    # Restic cache surviving between runs, so index and snapshot metadata is not downloaded
+    # again every night
+    cache_pvc = k8s.core.v1.PersistentVolumeClaim(
+        'restic-cache',
+        metadata={'name': 'restic-cache'},
+        spec={
+            'access_modes': ['ReadWriteOnce'],
+            'resources': {
+                'requests': {
+                    'storage': f'{component_config.restic.cache_size_gb}Gi',
+                },
+            },
+        },
+        opts=k8s_opts,
+    )
+
+    # Backup and maintenance pods set an active deadline, which puts them in the Terminating quota
+    # scope. The quota caps how many of them run at once, the Job controller retries pods rejected
+    # by it.
+    k8s.core.v1.ResourceQuota(
+        'backup-concurrency',
+        metadata={'name': 'backup-concurrency'},
+        spec={
+            'hard': {'pods': str(component_config.max_concurrent_backups)},
+            'scopes': ['Terminating'],
+        },
+        opts=k8s_opts,
+    )
+
+    # Nightly backups only add data, forget/prune and checks run on their own schedule
+    cronjobs = [
+        _create_volume_cronjob(
+            component_config,
+            volume_config,
+            job,
+            schedule,
+            backup_script_configmap,
+            restic_password_secret,
+            s3_credentials_secret,
+            cache_pvc,
+            k8s_opts,
+        )
+        for volume_config in component_config.volumes
+        for job, schedule in (
+            ('backup', component_config.schedule),
+            ('maintenance', component_config.maintenance.schedule),
+        )
+    ]
+    if component_config.benchmark is not None:
+        cronjobs.append(
+            _create_benchmark_cronjob(
+                component_config,
+                component_config.benchmark,
+                backup_script_configmap,
+                k8s_opts,
+            )
+        )
+    return cronjobs
+
+
+def _nfs_volume(volume_config: VolumeConfig) -> k8s.core.v1.VolumeArgsDict:
+    """NFS share of the volume, mounted using CSI driver."""
+    return {
+        'name': f'nfs-{volume_config.name}',
+        'csi': {
+            'driver': 'nfs.csi.k8s.io',
+            'volume_attributes': {
+                'server': volume_config.nfs_server,
+                'share': volume_config.nfs_path,
+                'mount_options': volume_config.nfs_mount_options,
+            },
+        },
+    }
+
+
+def _nfs_volume_mount(volume_config: VolumeConfig) -> k8s.core.v1.VolumeMountArgsDict:
+    return {
+        'name': f'nfs-{volume_config.name}',
+        'mount_path': volume_config.mount_path,
+        'read_only': True,
+    }
+
+
+def _restic_tuning_env(volume_config: VolumeConfig) -> list[k8s.core.v1.EnvVarArgsDict]:
+    """Compression, pack size and concurrency of the volume.
+
+    The scripts resolve `detect` and pass connections and upload limit as options of every restic
+    command, restic reads the rest from the environment.
+    """
+    env_vars: list[k8s.core.v1.EnvVarArgsDict] = [
+        {
+            'name': 'COMPRESSION',
+            'value': volume_config.compression.value,
+        },
+        {
+            'name': 'RESTIC_PACK_SIZE',
+            'value': str(volume_config.pack_size_mb),
+        },
+    ]
+    for name, value in (
+        ('RESTIC_READ_CONCURRENCY', volume_config.read_concurrency),
+        ('S3_CONNECTIONS', volume_config.s3_connections),
+        ('LIMIT_UPLOAD_KIB', volume_config.limit_upload_kib),
+    ):
+        if value is not None:
+            env_vars.append({'name': name, 'value': str(value)})
+    return env_vars
+
+
+def _create_volume_cronjob(
+    component_config: ComponentConfig,
+    volume_config: VolumeConfig,
+    job: t.Literal['backup', 'maintenance'],
+    schedule: str,
+    backup_script_configmap: k8s.core.v1.ConfigMap,
+    restic_password_secret: k8s.core.v1.Secret,
+    s3_credentials_secret: k8s.core.v1.Secret,
+    cache_pvc: k8s.core.v1.PersistentVolumeClaim,
+    k8s_opts: p.ResourceOptions,
+) -> k8s.batch.v1.CronJob:
     volumes: list[k8s.core.v1.VolumeArgsDict] = [
         {
             'name': 'backup-script',
@@ -73,6 +207,12 @@ def create_backup_cronjob(
                 'secret_name': restic_password_secret.metadata.name,
             },
         },
+        {
+            'name': 'restic-cache',
+            'persistent_volume_claim': {
+                'claim_name': cache_pvc.metadata.name,
+            },
+        },
     ]
 
     volume_mounts: list[k8s.core.v1.VolumeMountArgsDict] = [
@@ -86,43 +226,36 @@ def create_backup_cronjob(
             'mount_path': '/secrets',
             'read_only': True,
         },
+        {
+            'name': 'restic-cache',
+            'mount_path': '/cache',
+        },
     ]
 
-    # Add NFS volumes using CSI driver
-    for volume_config in component_config.volumes:
-        volume_name = f'nfs-{volume_config.name}'
-        volumes.append(
-            {
-                'name': volume_name,
-                'csi': {
-                    'driver': 'nfs.csi.k8s.io',
-                    'volume_attributes': {
-                        'server': volume_config.nfs_server,
-                        'share': volume_config.nfs_path,
-                        'mount_options': volume_config.nfs_mount_options,
-                    },
-                },
-            }
-        )
-
-        volume_mounts.append(
-            {
-                'name': volume_name,
-                'mount_path': volume_config.mount_path,
-                'read_only': True,
-            }
-        )
+    # Only backups read the NFS share
+    if job == 'backup':
+        volumes.append(_nfs_volume(volume_config))
+        volume_mounts.append(_nfs_volume_mount(volume_config))
 
     # Environment variables (non-sensitive only)
     env_vars: list[k8s.core.v1.EnvVarArgsDict] = [
         {
-            'name': 'RESTIC_COMPRESSION',
-            'value': 'max',
+            'name': 'VOLUME_NAME',
+            'value': volume_config.name,
         },
         {
-            'name': 'RESTIC_PACK_SIZE',
-            'value': '64M',
+            'name': 'MOUNT_PATH',
+            'value': volume_config.mount_path,
+        },
+        {
+            'name': 'BUCKET',
+            'value': volume_config.bucket,
         },
+        {
+            'name': 'OTLP_METRICS_ENDPOINT',
+            'value': utils.otlp.OTLP_METRICS_ENDPOINT,
+        },
+        *_restic_tuning_env(volume_config),
         # S3 credentials from secret
         {
             'name': 'AWS_S3_ENDPOINT',
@@ -153,17 +286,24 @@ def create_backup_cronjob(
         },
     ]
 
-    # CronJob for backup
+    resources = volume_config.resources or component_config.resources
+
+    name = (
+        f'backup-{volume_config.name}' if job == 'backup' else f'backup-{volume_config.name}-{job}'
+    )
     return k8s.batch.v1.CronJob(
-        'backup-cronjob',
-        metadata={'name': 'backup-cronjob'},
+        name,
+        metadata={'name': name},
         spec={
-            'schedule': component_config.schedule,
+            'schedule': schedule,
+            # A run still going on the next day finishes first
+            'concurrency_policy': 'Forbid',
             'job_template': {
                 'spec': {
                     'template': {
                         'spec': {
                             'restart_policy': 'OnFailure',
+                            'active_deadline_seconds': component_config.active_deadline_seconds,
                             'security_context': {
                                 'run_as_non_root': True,
                                 'run_as_user': 1000,
@@ -171,13 +311,13 @@ def create_backup_cronjob(
                             },
                             'containers': [
                                 {
-                                    'name': 'backup',
+                                    'name': job,
                                     'image': f'restic/restic:{component_config.restic.version}',
                                     'command': ['/bin/sh'],
-                                    'args': ['/scripts/backup.sh'],
+                                    'args': [f'/scripts/{job}.sh'],
                                     'env': env_vars,
                                     'volume_mounts': volume_mounts,
-                                    'resources': component_config.resources.to_resource_requirements(),
+                                    'resources': resources.to_resource_requirements(),
                                 }
                             ],
                             'volumes': volumes,
@@ -188,3 +328,154 @@ def create_backup_cronjob(
         },
         opts=k8s_opts,
     )
+
+
+def _create_benchmark_cronjob(
+    component_config: ComponentConfig,
+    benchmark_config: BenchmarkConfig,
+    backup_script_configmap: k8s.core.v1.ConfigMap,
+    k8s_opts: p.ResourceOptions,
+) -> k8s.batch.v1.CronJob:
+    """Create a suspended CronJob backing up a sample of a volume with every benchmark setting.
+
+    The repositories live in a MinIO sidecar, so the throughput is not limited by the uplink. Run
+    it with `kubectl create job --from=cronjob/backup-benchmark backup-benchmark-<date>`.
+    """
+    volumes_by_name = {volume.name: volume for volume in component_config.volumes}
+    if benchmark_config.volume not in volumes_by_name:
+        raise ValueError(f'Benchmark volume {benchmark_config.volume!r} is not configured')
+    volume_config = volumes_by_name[benchmark_config.volume]
+    minio_credentials: list[k8s.core.v1.EnvVarArgsDict] = [
+        {'name': 'MINIO_ROOT_USER', 'value': _BENCHMARK_MINIO_USER},
+        {'name': 'MINIO_ROOT_PASSWORD', 'value': _BENCHMARK_MINIO_PASSWORD},
+    ]
+    env_vars: list[k8s.core.v1.EnvVarArgsDict] = [
+        {
+            'name': 'VOLUME_NAME',
+            'value': volume_config.name,
+        },
+        {
+            'name': 'MOUNT_PATH',
+            'value': volume_config.mount_path,
+        },
+        {
+            'name': 'SAMPLE_SIZE_MB',
+            'value': str(benchmark_config.sample_size_mb),
+        },
+        {
+            'name': 'BENCHMARK_COMPRESSIONS',
+            'value': ' '.join(compression.value for compression in benchmark_config.compressions),
+        },
+        {
+            'name': 'BENCHMARK_PACK_SIZES',
+            'value': ' '.join(str(pack_size) for pack_size in benchmark_config.pack_sizes_mb),
+        },
+        {
+            'name': 'MINIO_ENDPOINT',
+            'value': 'http://localhost:9000',
+        },
+        {
+            'name': 'OTLP_METRICS_ENDPOINT',
+            'value': utils.otlp.OTLP_METRICS_ENDPOINT,
+        },
+        {
+            'name': 'AWS_ACCESS_KEY_ID',
+            'value': _BENCHMARK_MINIO_USER,
+        },
+        {
+            'name': 'AWS_SECRET_ACCESS_KEY',
+            'value': _BENCHMARK_MINIO_PASSWORD,
+        },
+        # Connections and read concurrency of the volume, but no upload limit
+        *(
+            env_var
+            for env_var in _restic_tuning_env(volume_config)
+            if env_var['name'] in ('RESTIC_READ_CONCURRENCY', 'S3_CONNECTIONS')
+        ),
+    ]
+
+    resources = volume_config.resources or component_config.resources
+
+    return k8s.batch.v1.CronJob(
+        'backup-benchmark',
+        metadata={'name': 'backup-benchmark'},
+        spec={
+            # Only started by hand
+            'schedule': '0 0 1 1 *',
+            'suspend': True,
+            'job_template': {
+                'spec': {
+                    'backoff_limit': 0,
+                    'template': {
+                        'spec': {
+                            'restart_policy': 'Never',
+                            'active_deadline_seconds': component_config.active_deadline_seconds,
+                            'security_context': {
+                                'run_as_non_root': True,
+                                'run_as_user': 1000,
+                                'fs_group': 1000,
+                            },
+                            'init_containers': [
+                                # Sidecar, stopped when the benchmark is done
+                                {
+                                    'name': 'minio',
+                                    'image': f'minio/minio:{benchmark_config.minio_version}',
+                                    'restart_policy': 'Always',
+                                    'args': ['server', '/data'],
+                                    'env': minio_credentials,
+                                    'volume_mounts': [
+                                        {
+                                            'name': 'minio-data',
+                                            'mount_path': '/data',
+                                        },
+                                    ],
+                                },
+                            ],
+                            'containers': [
+                                {
+                                    'name': 'benchmark',
+                                    'image': f'restic/restic:{component_config.restic.version}',
+                                    'command': ['/bin/sh'],
+                                    'args': ['/scripts/benchmark.sh'],
+                                    'env': env_vars,
+                                    'volume_mounts': [
+                                        {
+                                            'name': 'backup-script',
+                                            'mount_path': '/scripts',
+                                            'read_only': True,
+                                        },
+                                        {
+                                            'name': 'sample',
+                                            'mount_path': '/sample',
+                                        },
+                                        _nfs_volume_mount(volume_config),
+                                    ],
+                                    'resources': resources.to_resource_requirements(),
+                                }
+                            ],
+                            'volumes': [
+                                {
+                                    'name': 'backup-script',
+                                    'config_map': {
+                                        'name': backup_script_configmap.metadata.name,
+                                        'default_mode': 0o755,
+                                    },
+                                },
+                                {
+                                    'name': 'sample',
+                                    'empty_dir': {},
+                                },
+                                # Holds one repository per setting
+                                {
+                                    'name': 'minio-data',
+                                    'empty_dir': {},
+                                },
+                                _nfs_volume(volume_config),
+                            ],
+                        },
+                    },
+                },
+            },
+        },
+        opts=k8s_opts,
+    )
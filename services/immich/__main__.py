@@ -31,6 +31,7 @@ postgres_db = utils.postgres.PostgresDatabase(
     enable_superuser=True,
     backup_enabled=True,
     backup_config=component_config.postgres.backup,
+    config=component_config.postgres,
     # Use vectorchord-enabled PostgreSQL image for immich
     postgres_image=f'ghcr.io/tensorchord/cloudnative-vectorchord:{component_config.postgres.version}-{component_config.postgres.vectorchord_version}',
     spec_overrides={
@@ -25,10 +25,11 @@ class ImmichConfig(utils.model.LocalBaseModel):
     resources: ImmichResourcesConfig
 
 
-class PostgresConfig(utils.model.LocalBaseModel):
+class PostgresConfig(utils.model.PostgresClusterConfig):
     version: str
     vectorchord_version: str
     backup: utils.model.PostgresBackupConfig | None = None
+    workload: utils.model.PostgresWorkload = utils.model.PostgresWorkload.VECTOR
 
 
 class ComponentConfig(utils.model.LocalBaseModel):
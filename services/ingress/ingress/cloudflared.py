@@ -135,16 +135,12 @@ def create_cloudflared(
 
     # Create DNS records
     zone_name = p.Config().require_object('cloudflare')['zone']
-    zone = utils.cloudflare.get_zone(zone_name, cloudflare_provider)
-
-    for ingress in component_config.cloudflared.ingress:
-        cloudflare.DnsRecord(
-            ingress.hostname,
-            proxied=True,
-            name=ingress.hostname.split('.')[0],
-            type='CNAME',
-            content=p.Output.format('{}.cfargotunnel.com', tunnel.id),
-            ttl=1,
-            zone_id=zone.zone_id,
-            opts=cloudflare_opts,
-        )
+    utils.cloudflare.CloudflareRecordSet(
+        'cloudflared',
+        [ingress.hostname for ingress in component_config.cloudflared.ingress],
+        zone_name,
+        cloudflare_provider,
+        content=p.Output.format('{}.cfargotunnel.com', tunnel.id),
+        proxied=True,
+        ttl=1,
+    )
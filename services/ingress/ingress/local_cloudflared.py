@@ -62,19 +62,16 @@ def create_local_cloudflared(
     )
 
     zone_name = p.Config().require_object('cloudflare')['zone']
-    zone = utils.cloudflare.get_zone(zone_name, cloudflare_provider)
-    for ingress in component_config.local_cloudflared:
-        hostname_prefix = ingress.hostname.split('.')[0]
-        cloudflare.DnsRecord(
-            f'local-{ingress.hostname}',
-            proxied=True,
-            name=hostname_prefix,
-            type='CNAME',
-            content=p.Output.format('{}.cfargotunnel.com', tunnel.id),
-            ttl=1,
-            zone_id=zone.zone_id,
-            opts=cloudflare_opts,
-        )
+    utils.cloudflare.CloudflareRecordSet(
+        'local-cloudflared',
+        [ingress.hostname for ingress in component_config.local_cloudflared],
+        zone_name,
+        cloudflare_provider,
+        content=p.Output.format('{}.cfargotunnel.com', tunnel.id),
+        proxied=True,
+        ttl=1,
+        resource_prefix='local-',
+    )
 
     local_tunnel_token = p.Output.secret(tunnel_token.token)
     p.export('local_cloudflared_tunnel_name', tunnel.name)
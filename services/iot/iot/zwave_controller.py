@@ -254,7 +254,7 @@ class ZwaveeController(p.ComponentResource):
             opts=remote_opts,
         )
 
-        alloy_config_content = utils.utils.directory_content(alloy_path)
+        alloy_config_digest = utils.utils.directory_digest(alloy_path)
         alloy_config = pulumi_command.local.Command(
             'alloy-config',
             create=p.Output.format(
@@ -262,7 +262,7 @@ class ZwaveeController(p.ComponentResource):
                 str(alloy_path) + '/',
                 unifi_host,
             ),
-            triggers=[alloy_config_content, alloy_config_dir.id],
+            triggers=[alloy_config_digest, alloy_config_dir.id],
             opts=remote_opts,
         )
 
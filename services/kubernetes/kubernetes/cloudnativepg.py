@@ -76,12 +76,18 @@ def create_cloudnative_pg(component_config: ComponentConfig, k8s_provider: k8s.P
                         ),
                         'access-key-id': backup_access_key_id,
                         'secret-access-key': {'fn::secret': backup_secret_access_key},
+                        # Lets stacks validate their ObjectStore settings against the plugin, empty
+                        # when the latest chart is installed
+                        'barman-plugin-version': (
+                            component_config.cloudnative_pg.barman_plugin_version or ''
+                        ),
                         'pulumiConfig': {
                             'postgres-backup': {
                                 'destination-path': '${destination-path}',
                                 'endpoint-url': '${endpoint-url}',
                                 'access-key-id': '${access-key-id}',
                                 'secret-access-key': '${secret-access-key}',
+                                'barman-plugin-version': '${barman-plugin-version}',
                             },
                         },
                     },
@@ -41,6 +41,8 @@ class MicroK8sInstanceConfig(utils.model.LocalBaseModel):
     memory_max: int
     disks: list[DiskConfig]
     address: ipaddress.IPv4Interface
+    # 2Mi huge pages reserved at boot, e.g. for PostgreSQL shared buffers
+    hugepages_2mi: int = 0
 
 
 class MicroK8sConfig(utils.model.LocalBaseModel):
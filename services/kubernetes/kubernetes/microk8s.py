@@ -25,6 +25,7 @@ def _get_cloud_config(
     username: str,
     ssh_public_key: str,
     component_config: ComponentConfig,
+    hugepages_2mi: int = 0,
 ) -> str:
     PACKAGES = ' '.join(
         [
@@ -71,12 +72,20 @@ def _get_cloud_config(
             'mounts': [
                 ['LABEL=data', '/var/snap/microk8s/common/default-storage'],
             ],
+            # Huge pages are reserved before the kubelet starts so it advertises them to pods
+            'write_files': [
+                {
+                    'path': '/etc/sysctl.d/60-hugepages.conf',
+                    'content': f'vm.nr_hugepages = {hugepages_2mi}\n',
+                },
+            ],
             # Install packages and configure MicroK8s
             'runcmd': [
                 # System update and prep
                 f'hostnamectl set-hostname {hostname}',
                 'apt-get update -y',
                 'apt-get upgrade -y',
+                'sysctl --system',
                 f'DEBIAN_FRONTEND=noninteractive apt-get install -y {PACKAGES}',
                 # MicroK8s install
                 'snap install microk8s --classic',
@@ -120,7 +129,11 @@ def create_microk8s(
         content_type='snippets',
         source_raw={
             'data': _get_cloud_config(
-                vm_config.name, 'ubuntu', component_config.microk8s.ssh_public_key, component_config
+                vm_config.name,
+                'ubuntu',
+                component_config.microk8s.ssh_public_key,
+                component_config,
+                vm_config.hugepages_2mi,
             ),
             'file_name': f'{vm_config.name}.yaml',
         },
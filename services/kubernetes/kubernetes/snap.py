@@ -1,19 +1,26 @@
+import collections.abc as c
+import functools
+import os
+
+import pulumi as p
 import requests
+import utils.cache
 
+type SnapInfoFetcher = c.Callable[[str, dict[str, str]], requests.Response]
 
-def get_snap_version(package: str, channel: str, architecture: str) -> str:
-    """Return the current version string of a snap for a given channel and architecture.
+_snap_version_cache = utils.cache.JsonFileCache('snap-versions')
 
-    This queries the Snap Store API and filters the channel-map entries to find the
-    exact match for the provided channel (e.g. "1.31/stable") and architecture (e.g. "amd64").
-    """
-    response = requests.get(
+
+def fetch_snap_info(package: str, headers: dict[str, str]) -> requests.Response:
+    """Query the Snap Store API for the info of a snap."""
+    return requests.get(
         f'https://api.snapcraft.io/v2/snaps/info/{package}',
-        headers={'Snap-Device-Series': '16'},
+        headers={'Snap-Device-Series': '16', **headers},
         timeout=10,
     )
-    data = response.json()
 
+
+def _parse_snap_version(data: dict, channel: str, architecture: str) -> str:
     versions = [
         version
         for version in data.get('channel-map', [])
@@ -23,3 +30,49 @@ def get_snap_version(package: str, channel: str, architecture: str) -> str:
     assert len(versions) == 1, f'Expected 1 version, got {len(versions)}'
 
     return versions[0]['version']
+
+
+@functools.cache
+def get_snap_version(
+    package: str,
+    channel: str,
+    architecture: str,
+    fetch: SnapInfoFetcher = fetch_snap_info,
+) -> str:
+    """Return the current version string of a snap for a given channel and architecture.
+
+    This queries the Snap Store API and filters the channel-map entries to find the
+    exact match for the provided channel (e.g. "1.31/stable") and architecture (e.g. "amd64").
+
+    Results are cached on disk for SNAP_VERSION_CACHE_TTL seconds (default: 1 hour). Expired
+    entries are revalidated with their ETag, and if the Snap Store cannot be reached the last
+    known version is used instead of failing the program.
+    """
+    ttl_seconds = float(os.environ.get('SNAP_VERSION_CACHE_TTL', '3600'))
+    cache_key = f'{package}:{channel}:{architecture}'
+
+    entry = _snap_version_cache.get_entry(cache_key)
+    version = _snap_version_cache.get(cache_key, ttl_seconds)
+    if version is not None:
+        return version
+
+    headers = {}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+
+    try:
+        response = fetch(package, headers)
+        if entry and response.status_code == 304:
+            version = entry['value']
+        else:
+            response.raise_for_status()
+            version = _parse_snap_version(response.json(), channel, architecture)
+    except requests.RequestException as e:
+        if entry is None:
+            raise
+        p.log.warn(f'Could not query snap store ({e}), using cached {package} {entry["value"]}')
+        return entry['value']
+
+    etag = response.headers.get('ETag') or (entry or {}).get('etag')
+    _snap_version_cache.set(cache_key, version, etag=etag)
+    return version
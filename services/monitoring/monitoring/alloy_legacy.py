@@ -63,11 +63,11 @@ class AlloyLegacy(p.ComponentResource):
             f'{target_user}@{target_host}:{target_root_dir}/alloy-config/'
         )
 
-        alloy_config = utils.utils.directory_content(alloy_path)
+        alloy_config_digest = utils.utils.directory_digest(alloy_path)
         alloy_config = pulumi_command.local.Command(
             'alloy-config',
             create=sync_command,
-            triggers=[alloy_config, alloy_config_dir_resource.id],
+            triggers=[alloy_config_digest, alloy_config_dir_resource.id],
             opts=docker_opts,
         )
 
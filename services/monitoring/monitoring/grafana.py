@@ -5,8 +5,55 @@ import pulumi_kubernetes as k8s
 import yaml
 
 from monitoring.config import ComponentConfig
+from monitoring.utils import get_assets_path
 
 GRAFANA_PORT = 3000
+DASHBOARDS_PATH = '/etc/grafana/dashboards'
+PROMETHEUS_DATASOURCE_UID = 'prometheus'
+
+# Backup alerts on the metrics pushed by the restic scripts, see utils.restic. Samples only exist
+# once per run, hence last_over_time. An alert fires when its query crosses the threshold.
+_BACKUP_ALERTS = [
+    (
+        'backup-failed',
+        'Backup failed',
+        'last_over_time(restic_backup_success[1d])',
+        ('lt', 1),
+        'The last backup of {{ $labels.volume }} to {{ $labels.repository }} failed.',
+    ),
+    (
+        'backup-stale',
+        'No successful backup for 36 hours',
+        'time() - last_over_time(restic_backup_last_success_timestamp_seconds[30d])',
+        ('gt', 36 * 3600),
+        'The last successful backup of {{ $labels.volume }} to {{ $labels.repository }} is older '
+        'than 36 hours.',
+    ),
+    (
+        'backup-throughput-regression',
+        'Backup throughput regression',
+        'last_over_time(restic_backup_throughput_bytes_per_second[1d])'
+        ' / quantile_over_time(0.5, restic_backup_throughput_bytes_per_second[14d])',
+        ('lt', 0.5),
+        'The last backup of {{ $labels.volume }} to {{ $labels.repository }} ran at less than '
+        'half of its median throughput of the last two weeks.',
+    ),
+    (
+        'backup-check-failed',
+        'Repository check failed',
+        'last_over_time(restic_check_success[8d])',
+        ('lt', 1),
+        'The last check of the repository {{ $labels.repository }} found errors.',
+    ),
+    (
+        'backup-prune-failed',
+        'Repository prune failed',
+        'last_over_time(restic_prune_success[8d])',
+        ('lt', 1),
+        'The last retention run of {{ $labels.volume }} in {{ $labels.repository }} failed to '
+        'forget or prune snapshots.',
+    ),
+]
 
 
 def _get_grafana_config(hostname: str):
@@ -28,6 +75,46 @@ def _get_grafana_config(hostname: str):
     )
 
 
+def _get_alert_rules() -> dict:
+    rules = [
+        {
+            'uid': uid,
+            'title': title,
+            'condition': 'B',
+            'data': [
+                {
+                    'refId': 'A',
+                    'relativeTimeRange': {'from': 600, 'to': 0},
+                    'datasourceUid': PROMETHEUS_DATASOURCE_UID,
+                    'model': {'refId': 'A', 'expr': expr, 'instant': True},
+                },
+                {
+                    'refId': 'B',
+                    'datasourceUid': '__expr__',
+                    'model': {
+                        'refId': 'B',
+                        'type': 'threshold',
+                        'expression': 'A',
+                        'conditions': [{'evaluator': {'type': operator, 'params': [threshold]}}],
+                    },
+                },
+            ],
+            # Volumes without any backup yet have no series
+            'noDataState': 'OK',
+            'execErrState': 'Error',
+            'for': '0s',
+            'annotations': {'summary': summary},
+        }
+        for uid, title, expr, (operator, threshold), summary in _BACKUP_ALERTS
+    ]
+    return {
+        'apiVersion': 1,
+        'groups': [
+            {'orgId': 1, 'name': 'backups', 'folder': 'Homelab', 'interval': '5m', 'rules': rules},
+        ],
+    }
+
+
 class Grafana(p.ComponentResource):
     def __init__(self, name: str, component_config: ComponentConfig, k8s_provider: k8s.Provider):
         super().__init__(f'lab:grafana:{name}', name)
@@ -75,6 +162,7 @@ class Grafana(p.ComponentResource):
                         'datasources': [
                             {
                                 'name': 'Prometheus',
+                                'uid': PROMETHEUS_DATASOURCE_UID,
                                 'type': 'prometheus',
                                 'access': 'proxy',
                                 'orgId': 1,
@@ -96,6 +184,55 @@ class Grafana(p.ComponentResource):
             opts=k8s_opts,
         )
 
+        # Dashboards bundled with the repo, provisioned read-only from files
+        config_dashboard_providers = k8s.core.v1.ConfigMap(
+            'grafana-dashboard-providers',
+            metadata={
+                'namespace': namespace.metadata.name,
+            },
+            data={
+                'dashboards.yml': yaml.safe_dump(
+                    {
+                        'apiVersion': 1,
+                        'providers': [
+                            {
+                                'name': 'homelab',
+                                'orgId': 1,
+                                'folder': 'Homelab',
+                                'type': 'file',
+                                'disableDeletion': True,
+                                'allowUiUpdates': False,
+                                'options': {'path': DASHBOARDS_PATH},
+                            },
+                        ],
+                    }
+                ),
+            },
+            opts=k8s_opts,
+        )
+        config_dashboards = k8s.core.v1.ConfigMap(
+            'grafana-dashboards',
+            metadata={
+                'namespace': namespace.metadata.name,
+            },
+            data={
+                dashboard.name: dashboard.read_text()
+                for dashboard in sorted(
+                    (get_assets_path() / 'grafana' / 'dashboards').glob('*.json')
+                )
+            },
+            opts=k8s_opts,
+        )
+
+        config_alerting = k8s.core.v1.ConfigMap(
+            'grafana-alerting',
+            metadata={
+                'namespace': namespace.metadata.name,
+            },
+            data={'alerting.yml': yaml.safe_dump(_get_alert_rules(), sort_keys=False)},
+            opts=k8s_opts,
+        )
+
         # Create TLS certs
         certificate = k8s.apiextensions.CustomResource(
             'certificate',
@@ -167,6 +304,20 @@ class Grafana(p.ComponentResource):
                                         'mount_path': '/etc/grafana/provisioning/datasources/datasources.yml',
                                         'sub_path': 'datasources.yml',
                                     },
+                                    {
+                                        'name': 'grafana-dashboard-providers',
+                                        'mount_path': '/etc/grafana/provisioning/dashboards/dashboards.yml',
+                                        'sub_path': 'dashboards.yml',
+                                    },
+                                    {
+                                        'name': 'grafana-dashboards',
+                                        'mount_path': DASHBOARDS_PATH,
+                                    },
+                                    {
+                                        'name': 'grafana-alerting',
+                                        'mount_path': '/etc/grafana/provisioning/alerting/alerting.yml',
+                                        'sub_path': 'alerting.yml',
+                                    },
                                     {
                                         'name': 'grafana-tls',
                                         'mount_path': '/etc/grafana/certs',
@@ -206,6 +357,24 @@ class Grafana(p.ComponentResource):
                                     'name': config_datasources.metadata.name,
                                 },
                             },
+                            {
+                                'name': 'grafana-dashboard-providers',
+                                'config_map': {
+                                    'name': config_dashboard_providers.metadata.name,
+                                },
+                            },
+                            {
+                                'name': 'grafana-dashboards',
+                                'config_map': {
+                                    'name': config_dashboards.metadata.name,
+                                },
+                            },
+                            {
+                                'name': 'grafana-alerting',
+                                'config_map': {
+                                    'name': config_alerting.metadata.name,
+                                },
+                            },
                             {
                                 'name': 'grafana-tls',
                                 'secret': {
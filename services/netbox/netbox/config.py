@@ -17,8 +17,9 @@ class NetboxResourcesConfig(utils.model.LocalBaseModel):
     valkey: utils.model.ResourcesConfig
 
 
-class PostgresConfig(utils.model.LocalBaseModel):
+class PostgresConfig(utils.model.PostgresClusterConfig):
     version: int
+    workload: utils.model.PostgresWorkload = utils.model.PostgresWorkload.LIGHT
 
 
 class NetboxConfig(utils.model.LocalBaseModel):
@@ -27,6 +27,7 @@ class Netbox(p.ComponentResource):
             namespace,
             k8s_provider,
             postgres_version=component_config.postgres.version,
+            config=component_config.postgres,
         )
 
         namespaced_provider = k8s.Provider(
@@ -4,6 +4,8 @@ import textwrap
 
 import pulumi as p
 import pulumi_kubernetes as k8s
+import utils.otlp
+import utils.restic
 
 from .config import ComponentConfig
 
@@ -17,10 +19,34 @@ BACKUP_SCRIPT = textwrap.dedent(
         echo "$(date '+%Y-%m-%d %H:%M:%S') $1"
     }}
 
+    {metrics_functions}
     log "Starting Paperless backup process..."
 
     KUBECTL="/usr/local/bin/kubectl"
 
+    # The orchestrator image has no wget, the restic sidecar sends the metrics instead
+    otlp_post() {{
+        $KUBECTL exec paperless-0 -c restic -- wget -q -O /dev/null \\
+            --header 'Content-Type: application/json' --post-data "$1" "$OTLP_METRICS_ENDPOINT"
+    }}
+
+    # Back up the export with the restic sidecar given by $1 and push the summary for the
+    # repository $2, returns the exit code of restic
+    run_backup() {{
+        status=0
+        $KUBECTL exec paperless-0 -c "$1" -- restic backup /usr/src/paperless/export \\
+            --tag paperless \\
+            --tag "$(date +%Y-%m-%d)" \\
+            --json > "/tmp/$2.json" || status=$?
+        grep -v '"message_type":"status"' "/tmp/$2.json" || true
+        backup_summary=""
+        if [ "$status" -eq 0 ]; then
+            backup_summary=$(grep '"message_type":"summary"' "/tmp/$2.json" || true)
+        fi
+        push_restic_summary paperless-backup "volume=paperless,repository=$2" "$backup_summary"
+        return "$status"
+    }}
+
     log "Using kubectl version: $($KUBECTL version --client --short 2>/dev/null || $KUBECTL version --client)"
 
     # Step 1: Export documents from Paperless
@@ -67,17 +93,13 @@ BACKUP_SCRIPT = textwrap.dedent(
 
     # Step 2: Run restic backup (primary Google Drive)
     log "Step 2: Running primary restic backup (gdrive)..."
-    $KUBECTL exec paperless-0 -c restic -- restic backup /usr/src/paperless/export \\
-        --tag paperless \\
-        --tag "$(date +%Y-%m-%d)"
+    run_backup restic gdrive
     log "Primary restic backup completed."
 
     # Optional secondary backup to IDrive E2 if sidecar exists
     if $KUBECTL get pod paperless-0 -o jsonpath='{{.spec.containers[*].name}}' | grep -q 'restic-idrive'; then
         log "Secondary restic sidecar detected; running IDrive E2 backup..."
-        $KUBECTL exec paperless-0 -c restic-idrive -- restic backup /usr/src/paperless/export \\
-            --tag paperless \\
-            --tag "$(date +%Y-%m-%d)" || {{ log "IDrive backup failed"; }}
+        run_backup restic-idrive idrive || {{ log "IDrive backup failed"; }}
         log "Secondary restic backup (IDrive) completed."
     else
         log "Secondary restic sidecar not present; skipping IDrive backup."
@@ -167,6 +189,9 @@ def create_backup_cronjob(
                 retention_daily=component_config.backup.retention_daily,
                 retention_weekly=component_config.backup.retention_weekly,
                 retention_monthly=component_config.backup.retention_monthly,
+                metrics_functions=(
+                    f'{utils.otlp.PUSH_METRICS_FUNCTIONS}\n{utils.restic.RESTIC_SUMMARY_FUNCTIONS}'
+                ),
             )
         },
         opts=k8s_opts,
@@ -190,6 +215,12 @@ def create_backup_cronjob(
                                     'image': f'registry.k8s.io/conformance:v{component_config.backup.kubectl_version}',
                                     'command': ['/bin/sh'],
                                     'args': ['/scripts/backup.sh'],
+                                    'env': [
+                                        {
+                                            'name': 'OTLP_METRICS_ENDPOINT',
+                                            'value': utils.otlp.OTLP_METRICS_ENDPOINT,
+                                        },
+                                    ],
                                     'volume_mounts': [
                                         {
                                             'name': 'backup-script',
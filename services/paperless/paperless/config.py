@@ -25,7 +25,7 @@ class GotenbergConfig(utils.model.LocalBaseModel):
     version: str
 
 
-class PostgresConfig(utils.model.LocalBaseModel):
+class PostgresConfig(utils.model.PostgresClusterConfig):
     version: int
 
 
@@ -32,6 +32,7 @@ class Paperless(p.ComponentResource):
             namespace,
             k8s_provider,
             postgres_version=component_config.postgres.version,
+            config=component_config.postgres,
         )
 
         admin_username = 'admin'
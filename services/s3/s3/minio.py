@@ -23,12 +23,12 @@ def create_minio(
     target_host = component_config.target.host
     target_user = component_config.target.user
 
-    # Create s3 DNS record
-    utils.cloudflare.create_cloudflare_cname(
-        's3', utils.cloudflare.get_cloudflare_zone(), cloudflare_provider
-    )
-    utils.cloudflare.create_cloudflare_cname(
-        'minio-console', utils.cloudflare.get_cloudflare_zone(), cloudflare_provider
+    # Create s3 DNS records
+    utils.cloudflare.CloudflareRecordSet(
+        'minio',
+        ['s3', 'minio-console'],
+        utils.cloudflare.get_cloudflare_zone(),
+        cloudflare_provider,
     )
 
     # Create data dir
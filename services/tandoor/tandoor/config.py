@@ -7,9 +7,10 @@ class TandoorConfig(utils.model.LocalBaseModel):
     resources: utils.model.ResourcesConfig
 
 
-class PostgresConfig(utils.model.LocalBaseModel):
+class PostgresConfig(utils.model.PostgresClusterConfig):
     version: int
     backup: utils.model.PostgresBackupConfig | None = None
+    workload: utils.model.PostgresWorkload = utils.model.PostgresWorkload.LIGHT
 
 
 class ComponentConfig(utils.model.LocalBaseModel):
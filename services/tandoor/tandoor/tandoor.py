@@ -34,6 +34,7 @@ def create_tandoor(component_config: ComponentConfig, k8s_provider: k8s.Provider
         k8s_provider=k8s_provider,
         backup_enabled=component_config.postgres.backup is not None,
         backup_config=component_config.postgres.backup,
+        config=component_config.postgres,
     )
 
     # Create secret key for Django
@@ -0,0 +1,64 @@
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+import typing as t
+
+
+def get_cache_dir() -> pathlib.Path:
+    """
+    Directory for on-disk caches shared by all Pulumi programs of this repo.
+    """
+    base_dir = os.environ.get('XDG_CACHE_HOME') or pathlib.Path.home() / '.cache'
+    return pathlib.Path(base_dir) / 'homelab'
+
+
+class JsonFileCache:
+    """
+    Small key/value cache persisted as a single JSON file.
+
+    Each entry stores the value together with the time it was written and optional metadata
+    (e.g. an ETag), so callers can decide themselves whether an entry is fresh or only good
+    enough as a fallback.
+    """
+
+    def __init__(self, name: str):
+        self.path = get_cache_dir() / f'{name}.json'
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, dict[str, t.Any]]:
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8'))
+        except OSError, ValueError:
+            return {}
+
+    def get_entry(self, key: str) -> dict[str, t.Any] | None:
+        """
+        Return the raw entry with `value`, `stored_at` and any metadata.
+        """
+        with self._lock:
+            return self._load().get(key)
+
+    def get(self, key: str, ttl_seconds: float) -> t.Any | None:
+        """
+        Return the cached value if it is younger than ttl_seconds.
+        """
+        entry = self.get_entry(key)
+        if entry is None or time.time() - entry['stored_at'] > ttl_seconds:
+            return None
+        return entry['value']
+
+    def set(self, key: str, value: t.Any, **metadata: t.Any) -> None:
+        with self._lock:
+            data = self._load()
+            data[key] = {'value': value, 'stored_at': time.time(), **metadata}
+
+            # Write atomically, multiple programs may share the cache
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                'w', dir=self.path.parent, delete=False, encoding='utf-8'
+            ) as tmp_file:
+                json.dump(data, tmp_file)
+            pathlib.Path(tmp_file.name).replace(self.path)
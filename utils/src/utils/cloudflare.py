@@ -1,7 +1,22 @@
+import collections.abc as c
 import functools
+import os
+import typing as t
 
 import pulumi as p
-import pulumi_cloudflare as cloudflare
+
+from utils.cache import JsonFileCache
+
+if t.TYPE_CHECKING:
+    # The provider SDK is imported lazily by the helpers that need it, so stacks only reading
+    # the zone name do not pay for loading it
+    import pulumi_cloudflare as cloudflare
+
+# Zone lookups of this program, keyed by provider and zone name
+_zone_cache: dict[tuple[cloudflare.Provider, str], p.Output[cloudflare.GetZoneResult]] = {}
+
+# Optional on-disk cache of zone ids, shared across previews of all stacks
+_zone_id_file_cache = JsonFileCache('cloudflare-zones')
 
 
 @functools.cache
@@ -10,6 +25,8 @@ def get_cloudflare_zone():
 
 
 def get_cloudflare_provider() -> cloudflare.Provider:
+    import pulumi_cloudflare as cloudflare  # noqa: PLC0415
+
     pulumi_config = p.Config()
 
     # Load cloudflare config from ESC
@@ -27,10 +44,41 @@ def get_cloudflare_provider() -> cloudflare.Provider:
 def get_zone(
     name: str, cloudflare_provider: cloudflare.Provider
 ) -> p.Output[cloudflare.GetZoneResult]:
-    return cloudflare.get_zone_output(
-        filter={'match': 'all', 'name': name},
-        opts=p.InvokeOptions(provider=cloudflare_provider),
-    )
+    """
+    Look up a zone by name, repeated lookups for the same provider share one invoke.
+    """
+    import pulumi_cloudflare as cloudflare  # noqa: PLC0415
+
+    key = (cloudflare_provider, name)
+    if key not in _zone_cache:
+        _zone_cache[key] = cloudflare.get_zone_output(
+            filter={'match': 'all', 'name': name},
+            opts=p.InvokeOptions(provider=cloudflare_provider),
+        )
+    return _zone_cache[key]
+
+
+def get_zone_id(name: str, cloudflare_provider: cloudflare.Provider) -> p.Output[str]:
+    """
+    Look up the id of a zone by name.
+
+    If CLOUDFLARE_ZONE_CACHE_TTL is set to a number of seconds, resolved zone ids are kept in an
+    on-disk cache for that long and the lookup is skipped entirely while the entry is fresh.
+    """
+    ttl_seconds = float(os.environ.get('CLOUDFLARE_ZONE_CACHE_TTL', '0'))
+    cache_key = f'{cloudflare_provider.pulumi_resource_name}:{name}'
+
+    if ttl_seconds > 0:
+        zone_id = _zone_id_file_cache.get(cache_key, ttl_seconds)
+        if zone_id is not None:
+            return p.Output.from_input(zone_id)
+
+    def store(zone_id: str) -> str:
+        if ttl_seconds > 0 and zone_id:
+            _zone_id_file_cache.set(cache_key, zone_id)
+        return zone_id
+
+    return get_zone(name, cloudflare_provider).zone_id.apply(store)
 
 
 def create_cloudflare_cname(
@@ -39,15 +87,12 @@ def create_cloudflare_cname(
     cloudflare_provider: cloudflare.Provider,
     opts: p.ResourceOptions | None = None,
 ) -> cloudflare.DnsRecord:
+    import pulumi_cloudflare as cloudflare  # noqa: PLC0415
+
     cloudflare_opts = p.ResourceOptions(provider=cloudflare_provider)
     if opts:
         cloudflare_opts = opts.merge(cloudflare_opts)
 
-    zone = cloudflare.get_zone_output(
-        filter={'match': 'all', 'name': zone_name},
-        opts=p.InvokeOptions(provider=cloudflare_provider),
-    )
-
     return cloudflare.DnsRecord(
         name,
         proxied=False,
@@ -55,6 +100,73 @@ def create_cloudflare_cname(
         type='CNAME',
         content=f'home.{zone_name}',
         ttl=60,
-        zone_id=zone.zone_id,
+        zone_id=get_zone_id(zone_name, cloudflare_provider),
         opts=cloudflare_opts,
     )
+
+
+class CloudflareRecordSet(p.ComponentResource):
+    """
+    Set of DNS records in one zone pointing to the same content.
+
+    The zone is resolved once for all records. The Cloudflare provider has no resource for the
+    batch DNS endpoint, so records are still created individually but grouped under this
+    component. Records are aliased to their previous top-level URNs so that moving existing
+    records into a set does not replace them.
+    """
+
+    records: dict[str, cloudflare.DnsRecord]
+
+    def __init__(
+        self,
+        name: str,
+        hostnames: c.Sequence[str],
+        zone_name: str,
+        cloudflare_provider: cloudflare.Provider,
+        *,
+        content: p.Input[str] | None = None,
+        record_type: str = 'CNAME',
+        proxied: bool = False,
+        ttl: int = 60,
+        resource_prefix: str = '',
+        opts: p.ResourceOptions | None = None,
+    ):
+        """Initialize record set.
+
+        Args:
+            name: Logical name of the component.
+            hostnames: Hostnames in the zone, the first label is the record name.
+            zone_name: Name of the zone the records are created in.
+            cloudflare_provider: Cloudflare provider instance.
+            content: Record content (default: 'home.<zone_name>').
+            record_type: DNS record type (default: 'CNAME').
+            proxied: Whether the records are proxied by Cloudflare (default: False).
+            ttl: Record TTL, 1 means automatic (default: 60).
+            resource_prefix: Prefix of the logical names of the record resources (default: '').
+            opts: Pulumi resource options.
+        """
+        import pulumi_cloudflare as cloudflare  # noqa: PLC0415
+
+        super().__init__(f'lab:cloudflare_record_set:{name}', name, None, opts)
+
+        record_opts = p.ResourceOptions(
+            provider=cloudflare_provider,
+            parent=self,
+            aliases=[p.Alias(parent=p.ROOT_STACK_RESOURCE)],
+        )
+        zone_id = get_zone_id(zone_name, cloudflare_provider)
+
+        self.records = {}
+        for hostname in hostnames:
+            self.records[hostname] = cloudflare.DnsRecord(
+                f'{resource_prefix}{hostname}',
+                proxied=proxied,
+                name=hostname.split('.')[0],
+                type=record_type,
+                content=content if content is not None else f'home.{zone_name}',
+                ttl=ttl,
+                zone_id=zone_id,
+                opts=record_opts,
+            )
+
+        self.register_outputs({})
@@ -1,8 +1,13 @@
+import enum
 import pathlib
+import typing as t
 
-import pulumi_kubernetes as k8s
 import pydantic
 
+if t.TYPE_CHECKING:
+    # Only needed for annotations, keeps stacks without Kubernetes resources from loading the SDK
+    import pulumi_kubernetes as k8s
+
 
 def get_pulumi_project(model_dir: str):
     search_dir = pathlib.Path(model_dir).parent
@@ -55,5 +60,97 @@ class ResourcesConfig(LocalBaseModel):
         }
 
 
+class PostgresWorkload(enum.StrEnum):
+    """
+    Workload profile used to tune PostgreSQL parameters"""
+
+    OLTP = 'oltp'
+    VECTOR = 'vector'
+    LIGHT = 'light'
+
+
+class PostgresDurability(enum.StrEnum):
+    """
+    Durability tier of a PostgreSQL cluster, trading commit latency against data safety
+
+    - strict: every commit waits for its WAL flush, PostgreSQL defaults. Lowest throughput
+      for small transactions, nothing acknowledged is lost and crash recovery is short.
+    - balanced: commits still wait for the flush but are grouped with concurrent commits and
+      checkpoints are spread further. Nothing acknowledged is lost, higher throughput under
+      concurrent writes and less WAL, at the cost of slightly longer crash recovery.
+    - fast: commits return before the WAL flush. Lowest latency and least disk I/O, a crash
+      loses up to about a second of acknowledged transactions but never corrupts data."""
+
+    STRICT = 'strict'
+    BALANCED = 'balanced'
+    FAST = 'fast'
+
+
+class BarmanCompression(enum.StrEnum):
+    """
+    Compression of WAL files and base backups uploaded by the Barman Cloud plugin"""
+
+    GZIP = 'gzip'
+    BZIP2 = 'bzip2'
+    SNAPPY = 'snappy'
+    LZ4 = 'lz4'
+    ZSTD = 'zstd'
+
+
 class PostgresBackupConfig(LocalBaseModel):
     cron_schedule: str = '0 0 0 * * *'
+    wal_compression: BarmanCompression = BarmanCompression.GZIP
+    wal_max_parallel: pydantic.PositiveInt = 1
+    data_compression: BarmanCompression | None = None
+    data_jobs: pydantic.PositiveInt = 1
+
+
+class PgBouncerPoolMode(enum.StrEnum):
+    """
+    PgBouncer pool mode of a CloudNativePG pooler"""
+
+    SESSION = 'session'
+    TRANSACTION = 'transaction'
+
+
+class PostgresPoolerConfig(LocalBaseModel):
+    pool_mode: PgBouncerPoolMode = PgBouncerPoolMode.TRANSACTION
+    instances: int = 1
+    default_pool_size: int = 10
+    max_client_conn: int = 100
+    resources: ResourcesConfig | None = None
+
+
+class PostgresMaintenanceConfig(LocalBaseModel):
+    # Kubernetes cron schedule of the maintenance job
+    schedule: str = '30 3 * * 0'
+    # Image providing psql and wget
+    image: str = 'postgres:18-alpine'
+    # Tables with at least this share of dead tuples are vacuumed
+    vacuum_dead_ratio: float = 0.05
+    # B-tree indexes with at least this estimated share of bloat are rebuilt
+    reindex_bloat_ratio: float = 0.3
+    reindex_min_size_mb: int = 16
+    # Storage parameters per table, e.g. {'public.asset': {'autovacuum_vacuum_scale_factor': '0.02'}}
+    table_settings: dict[str, dict[str, str]] = {}
+    resources: ResourcesConfig | None = None
+
+
+class PostgresClusterConfig(LocalBaseModel):
+    """
+    Sizing, tuning and maintenance of a CloudNativePG cluster, the base of the postgres config
+    of each service"""
+
+    # All but the primary are streaming read replicas
+    instances: int = 1
+    # Resources of each instance, also used to tune memory and parallelism parameters
+    resources: ResourcesConfig | None = None
+    workload: PostgresWorkload = PostgresWorkload.OLTP
+    durability: PostgresDurability = PostgresDurability.STRICT
+    # Amount of 2Mi huge pages per instance backing shared buffers, requires resources
+    huge_pages: str | None = None
+    # PgBouncer in front of the cluster, published in `PostgresDatabase.pooler_secret_name`
+    pooler: PostgresPoolerConfig | None = None
+    # Existing clusters need `CREATE EXTENSION pg_stat_statements` in the postgres database once
+    pg_stat_statements: bool = False
+    maintenance: PostgresMaintenanceConfig | None = None
@@ -1,7 +1,191 @@
+import bisect
+import math
 import os
+import threading
+import time
+import urllib.parse
 
 import pulumi as p
 import requests
+import requests.adapters
+import urllib3.util.retry
+
+# Upper bounds (in seconds) of the latency histogram buckets
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+# Commands without side effects, these are safe to retry after the request has been sent. All
+# API calls are POST requests, so the HTTP method does not tell them apart.
+_IDEMPOTENT_COMMAND_PREFIXES = ('search', 'get')
+
+
+def _api_command(url: str) -> str:
+    """
+    Module, controller and command of an API URL, i.e. without the endpoint and trailing uuids.
+    """
+    path = urllib.parse.urlparse(url).path
+    return '/'.join(path.split('/api/', 1)[-1].split('/')[:3])
+
+
+class LatencyHistogram:
+    """
+    Bucketed latency histogram of API calls.
+    """
+
+    def __init__(self):
+        self.counts = [0] * len(_LATENCY_BUCKETS)
+        self.total = 0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(_LATENCY_BUCKETS, seconds)] += 1
+        self.total += 1
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bucket bound containing the given quantile.
+        """
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(_LATENCY_BUCKETS, self.counts, strict=True):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> str:
+        return (
+            f'n={self.total} p50<={self.quantile(0.5):.2f}s '
+            f'p95<={self.quantile(0.95):.2f}s max={self.max:.2f}s'
+        )
+
+
+class OpnSenseClient(requests.Session):
+    """
+    Keep-alive session to the OPNsense API with retries, default timeouts and latency tracking.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        *,
+        pool_size: int,
+        retries: int,
+        timeout: tuple[float, float],
+        slow_call_seconds: float,
+    ):
+        super().__init__()
+        self.auth = (api_key, api_secret)
+        self.timeout = timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.latencies: dict[str, LatencyHistogram] = {}
+        self._latencies_lock = threading.Lock()
+
+        # Connection errors are retried for all commands as the request has not been sent yet. Read
+        # errors and error responses are only retried for idempotent commands, add/set/del and
+        # reconfigure calls could otherwise be applied twice.
+        def adapter(allowed_methods: frozenset[str]) -> requests.adapters.HTTPAdapter:
+            retry = urllib3.util.retry.Retry(
+                total=retries,
+                backoff_factor=0.5,
+                backoff_jitter=0.5,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=allowed_methods,
+            )
+            return requests.adapters.HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=pool_size,
+                pool_block=True,
+                max_retries=retry,
+            )
+
+        self._idempotent_adapter = adapter(
+            urllib3.util.retry.Retry.DEFAULT_ALLOWED_METHODS | {'POST'}
+        )
+        default_adapter = adapter(urllib3.util.retry.Retry.DEFAULT_ALLOWED_METHODS)
+        self.mount('https://', default_adapter)
+        self.mount('http://', default_adapter)
+
+    def get_adapter(self, url: str) -> requests.adapters.BaseAdapter:
+        command = _api_command(url).rsplit('/', 1)[-1]
+        if command.startswith(_IDEMPOTENT_COMMAND_PREFIXES):
+            return self._idempotent_adapter
+        return super().get_adapter(url)
+
+    def request(self, method, url, *args, **kwargs) -> requests.Response:  # type: ignore[override]
+        kwargs.setdefault('timeout', self.timeout)
+
+        start = time.monotonic()
+        try:
+            return super().request(method, url, *args, **kwargs)
+        finally:
+            self._observe(str(method), str(url), time.monotonic() - start)
+
+    def _observe(self, method: str, url: str, seconds: float) -> None:
+        command = _api_command(url)
+
+        with self._latencies_lock:
+            histogram = self.latencies.setdefault(command, LatencyHistogram())
+            histogram.observe(seconds)
+            summary = histogram.summary()
+
+        if seconds >= self.slow_call_seconds:
+            p.log.warn(f'Slow OPNsense API call {method} {command}: {seconds:.2f}s ({summary})')
+
+    def report_latencies(self) -> None:
+        """
+        Log the latencies per API command since the last report at info level.
+
+        Debug messages of the dynamic provider process are not shown, so instead of logging each
+        call, providers report once per batch of changes and per bulk read. Reporting at exit would
+        log after the connection to the engine may already be closed.
+        """
+        with self._latencies_lock:
+            latencies, self.latencies = self.latencies, {}
+
+        if latencies:
+            p.log.info(
+                'OPNsense API latencies: '
+                + ', '.join(
+                    f'{command} {histogram.summary()}'
+                    for command, histogram in sorted(latencies.items())
+                )
+            )
+
+
+_clients: dict[tuple[str, str, str], OpnSenseClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_pooled_client(endpoint: str, api_key: str, api_secret: str) -> OpnSenseClient:
+    """
+    Return the process-wide client for the given endpoint and credentials.
+
+    Tuning is read from the environment:
+        OPNSENSE_POOL_SIZE: Maximum number of kept-alive connections (default: 4).
+        OPNSENSE_RETRIES: Number of retries with jittered backoff (default: 3).
+        OPNSENSE_CONNECT_TIMEOUT: Connect timeout in seconds (default: 5).
+        OPNSENSE_READ_TIMEOUT: Read timeout in seconds (default: 60).
+        OPNSENSE_SLOW_CALL_SECONDS: Calls taking longer are logged as warning (default: 2).
+    """
+    key = (endpoint, api_key, api_secret)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpnSenseClient(
+                api_key,
+                api_secret,
+                pool_size=int(os.environ.get('OPNSENSE_POOL_SIZE', '4')),
+                retries=int(os.environ.get('OPNSENSE_RETRIES', '3')),
+                timeout=(
+                    float(os.environ.get('OPNSENSE_CONNECT_TIMEOUT', '5')),
+                    float(os.environ.get('OPNSENSE_READ_TIMEOUT', '60')),
+                ),
+                slow_call_seconds=float(os.environ.get('OPNSENSE_SLOW_CALL_SECONDS', '2')),
+            )
+            _clients[key] = client
+        return client
 
 
 class OpnSenseBaseProvider(p.dynamic.ResourceProvider):
@@ -14,10 +198,8 @@ class OpnSenseBaseProvider(p.dynamic.ResourceProvider):
         self.api_secret = os.environ['OPNSENSE_API_SECRET']
         self.endpoint = os.environ['OPNSENSE_ENDPOINT']
 
-    def get_client(self) -> requests.Session:
-        client = requests.Session()
-        client.auth = (self.api_key, self.api_secret)
-        return client
+    def get_client(self) -> OpnSenseClient:
+        return get_pooled_client(self.endpoint, self.api_key, self.api_secret)
 
     def get_api_path(self, module: str, controller: str, command: str, *args) -> str:
         return '/'.join([self.endpoint, 'api', module, controller, command, *args])
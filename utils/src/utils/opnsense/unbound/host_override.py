@@ -1,15 +1,31 @@
+import collections.abc as c
+import os
+import threading
+import time
 import typing as t
 
 import pulumi as p
-import requests
+import pulumi.runtime.rpc
 
-from utils.opnsense.base import OpnSenseBaseProvider
+from utils.opnsense.base import OpnSenseBaseProvider, OpnSenseClient
+
+# Properties compared by diff, mapped to their key in the unbound host override payload
+_DIFF_PROPERTIES = {
+    'host': 'hostname',
+    'domain': 'domain',
+    'record_type': 'rr',
+    'ipaddress': 'server',
+    'description': 'description',
+}
+
+# How long a bulk search result is reused by concurrent reads (e.g. during `pulumi refresh`)
+_SEARCH_CACHE_TTL_SECONDS = 10.0
 
 
 def _unbound_override_payload(props: dict[str, t.Any]) -> dict[str, t.Any]:
     return {
         'host': {
-            'description': props.get('description', ''),
+            'description': props.get('description') or '',
             'domain': props['domain'],
             'enabled': '1',
             'hostname': props['host'],
@@ -20,8 +36,160 @@ def _unbound_override_payload(props: dict[str, t.Any]) -> dict[str, t.Any]:
     }
 
 
+class ReconfigureBatcher:
+    """
+    Coalesces service reconfigures across concurrent dynamic provider operations.
+
+    All dynamic resources of a deployment are handled by the same provider process, so a
+    process-wide batcher sees every mutation of the deployment. Each mutation blocks until a
+    reconfigure covering it has completed, which keeps `pulumi up` semantics unchanged: once an
+    operation returns, its change is live. The reconfigure itself is only issued when no other
+    mutation is in flight and none has finished within the debounce window.
+    """
+
+    def __init__(self, name: str, debounce_seconds: float):
+        self.name = name
+        self.debounce_seconds = debounce_seconds
+
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._last_change = 0.0
+        self._changes = 0
+        self._applied = 0
+        self._reconfiguring = False
+
+        # Statistics
+        self.requested = 0
+        self.performed = 0
+
+    @property
+    def saved(self) -> int:
+        """
+        Number of reconfigures avoided by batching.
+        """
+        return self.requested - self.performed
+
+    def _ready(self) -> bool:
+        return (
+            not self._reconfiguring
+            and self._in_flight == 0
+            and time.monotonic() - self._last_change >= self.debounce_seconds
+        )
+
+    def run[T](self, mutate: c.Callable[[], T], reconfigure: c.Callable[[], None]) -> T:
+        """
+        Run a mutation and wait until a (possibly shared) reconfigure has applied it.
+        """
+        with self._condition:
+            self._in_flight += 1
+
+        try:
+            result = mutate()
+        except BaseException:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            self._in_flight -= 1
+            self._changes += 1
+            self.requested += 1
+            self._last_change = time.monotonic()
+            change = self._changes
+            self._condition.notify_all()
+
+            while self._applied < change:
+                if not self._ready():
+                    remaining = self.debounce_seconds - (time.monotonic() - self._last_change)
+                    self._condition.wait(timeout=max(remaining, 0.05))
+                    continue
+
+                # This thread becomes the leader and applies all changes recorded so far
+                target = self._changes
+                self._reconfiguring = True
+                self._condition.release()
+                try:
+                    reconfigure()
+                finally:
+                    self._condition.acquire()
+                    self._reconfiguring = False
+                    self._condition.notify_all()
+
+                self._applied = target
+                self.performed += 1
+                p.log.info(
+                    f'Reconfigured {self.name} ({self.performed} reconfigures for '
+                    f'{self.requested} changes, {self.saved} saved by batching)'
+                )
+
+        return result
+
+
+_unbound_batcher = ReconfigureBatcher(
+    'unbound',
+    debounce_seconds=float(os.environ.get('OPNSENSE_UNBOUND_RECONFIGURE_DEBOUNCE', '1.0')),
+)
+
+
+def _props_from_search_row(row: dict[str, t.Any]) -> dict[str, t.Any]:
+    """
+    Convert a row returned by `searchHostOverride` back into resource properties.
+    """
+    # Depending on the OPNsense version the record type is returned as e.g. 'A (IPv4 address)'
+    record_type = str(row.get('rr', '')).split(' ', 1)[0]
+
+    return {
+        'host': row.get('hostname', ''),
+        'domain': row.get('domain', ''),
+        'record_type': record_type,
+        'ipaddress': row.get('server', ''),
+        'description': row.get('description') or None,
+    }
+
+
+class _HostOverrideSearchCache:
+    """
+    Process-wide cache of all host overrides, fetched with a single bulk search.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._fetched_at = 0.0
+        self._rows: dict[str, dict[str, t.Any]] | None = None
+
+    def get(self, fetch: c.Callable[[], list[dict[str, t.Any]]]) -> dict[str, dict[str, t.Any]]:
+        with self._lock:
+            if self._rows is None or time.monotonic() - self._fetched_at > self.ttl_seconds:
+                self._rows = {row['uuid']: row for row in fetch()}
+                self._fetched_at = time.monotonic()
+            return self._rows
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._rows = None
+
+
+_search_cache = _HostOverrideSearchCache(_SEARCH_CACHE_TTL_SECONDS)
+
+
 class HostOverrideProvider(OpnSenseBaseProvider):
-    def _reconfigure_unbound(self, client: requests.Session) -> None:
+    def _search_host_overrides(self, client: OpnSenseClient) -> list[dict[str, t.Any]]:
+        """
+        Fetch all host overrides in one request.
+        """
+        response = client.post(
+            self.get_api_path('unbound', 'settings', 'searchHostOverride'),
+            json={'current': 1, 'rowCount': -1, 'searchPhrase': ''},
+        )
+        response.raise_for_status()
+
+        # A refresh only reads, report its calls here instead of after a batch of changes
+        client.report_latencies()
+        return response.json().get('rows', [])
+
+    def _reconfigure_unbound(self, client: OpnSenseClient) -> None:
         """
         Reconfigure unbound service.
         """
@@ -30,22 +198,68 @@ class HostOverrideProvider(OpnSenseBaseProvider):
         data = response.json()
         assert data.get('status') == 'ok', 'Failed to reconfigure unbound'
 
+        # Mutations are live now, drop any cached search result
+        _search_cache.invalidate()
+        client.report_latencies()
+
+    def diff(
+        self,
+        _id: str,
+        _olds: dict[str, t.Any],
+        _news: dict[str, t.Any],
+    ) -> p.dynamic.DiffResult:
+        """
+        Compare normalized payloads, this does not call the OPNsense API.
+        """
+        old_payload = _unbound_override_payload(_olds)['host']
+        new_payload = _unbound_override_payload(_news)['host']
+
+        # Values only known after apply are reported as potentially changed
+        changed = [
+            prop
+            for prop, key in _DIFF_PROPERTIES.items()
+            if _news.get(prop) == pulumi.runtime.rpc.UNKNOWN or old_payload[key] != new_payload[key]
+        ]
+
+        return p.dynamic.DiffResult(
+            changes=bool(changed),
+            replaces=[],
+            stables=[prop for prop in _DIFF_PROPERTIES if prop not in changed],
+            delete_before_replace=False,
+        )
+
+    def read(self, id_: str, props: dict[str, t.Any]) -> p.dynamic.ReadResult:
+        """
+        Read live host override, shares one bulk search across all resources.
+        """
+        client = self.get_client()
+        rows = _search_cache.get(lambda: self._search_host_overrides(client))
+
+        row = rows.get(id_)
+        if row is None:
+            # Override was deleted out of band, an empty id tells the engine it is gone
+            return p.dynamic.ReadResult(id_=None, outs={})
+
+        return p.dynamic.ReadResult(id_=id_, outs={**props, **_props_from_search_row(row)})
+
     def create(self, props: dict[str, t.Any]) -> p.dynamic.CreateResult:
         """
         Create new host override.
         """
         client = self.get_client()
-        response = client.post(
-            self.get_api_path('unbound', 'settings', 'addHostOverride'),
-            json=_unbound_override_payload(props),
-        )
-        response.raise_for_status()
-        data = response.json()
-        assert data.get('result') == 'saved', 'Failed to create unbound override'
-        uuid = data['uuid']
 
-        # Reconfigure unbound to apply the changes
-        self._reconfigure_unbound(client)
+        def mutate() -> str:
+            response = client.post(
+                self.get_api_path('unbound', 'settings', 'addHostOverride'),
+                json=_unbound_override_payload(props),
+            )
+            response.raise_for_status()
+            data = response.json()
+            assert data.get('result') == 'saved', 'Failed to create unbound override'
+            return data['uuid']
+
+        # Reconfigure unbound to apply the changes, batched with concurrent operations
+        uuid = _unbound_batcher.run(mutate, lambda: self._reconfigure_unbound(client))
 
         return p.dynamic.CreateResult(id_=uuid, outs=props)
 
@@ -59,16 +273,18 @@ class HostOverrideProvider(OpnSenseBaseProvider):
         Update existing host override.
         """
         client = self.get_client()
-        response = client.post(
-            f'{self.get_api_path("unbound", "settings", "setHostOverride")}/{_id}',
-            json=_unbound_override_payload(_news),
-        )
-        response.raise_for_status()
-        data = response.json()
-        assert data.get('result') == 'saved', 'Failed to update unbound override'
 
-        # Reconfigure unbound to apply the changes
-        self._reconfigure_unbound(client)
+        def mutate() -> None:
+            response = client.post(
+                f'{self.get_api_path("unbound", "settings", "setHostOverride")}/{_id}',
+                json=_unbound_override_payload(_news),
+            )
+            response.raise_for_status()
+            data = response.json()
+            assert data.get('result') == 'saved', 'Failed to update unbound override'
+
+        # Reconfigure unbound to apply the changes, batched with concurrent operations
+        _unbound_batcher.run(mutate, lambda: self._reconfigure_unbound(client))
 
         return p.dynamic.UpdateResult(outs=_news)
 
@@ -77,16 +293,18 @@ class HostOverrideProvider(OpnSenseBaseProvider):
         Delete existing host override.
         """
         client = self.get_client()
-        response = client.post(
-            f'{self.get_api_path("unbound", "settings", "delHostOverride")}/{_id}',
-            json={'uuid': _id},
-        )
-        response.raise_for_status()
-        data = response.json()
-        assert data.get('result') == 'deleted', 'Failed to delete unbound override'
 
-        # Reconfigure unbound to apply the changes
-        self._reconfigure_unbound(client)
+        def mutate() -> None:
+            response = client.post(
+                f'{self.get_api_path("unbound", "settings", "delHostOverride")}/{_id}',
+                json={'uuid': _id},
+            )
+            response.raise_for_status()
+            data = response.json()
+            assert data.get('result') == 'deleted', 'Failed to delete unbound override'
+
+        # Reconfigure unbound to apply the changes, batched with concurrent operations
+        _unbound_batcher.run(mutate, lambda: self._reconfigure_unbound(client))
 
 
 class HostOverride(p.dynamic.Resource):
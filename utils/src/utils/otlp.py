@@ -0,0 +1,39 @@
+import textwrap
+
+# OTLP/HTTP receiver of Alloy, metrics end up in Mimir. Shell scripts cannot speak gRPC, so
+# they use the HTTP port next to ALLOY_OTEL_GRPC_PORT.
+OTLP_METRICS_ENDPOINT = 'http://alloy.alloy.svc.cluster.local:4318/v1/metrics'
+
+# Shell functions pushing gauges as OTLP JSON to $OTLP_METRICS_ENDPOINT with busybox or GNU wget:
+#
+#   push_metrics <service.name> <key=value,...> <metric=value> [<metric=value> ...]
+#
+# Scripts without wget can redefine otlp_post to send the payload in another way.
+PUSH_METRICS_FUNCTIONS = textwrap.dedent(
+    """\
+    otlp_post() {
+        wget -q -O /dev/null --header 'Content-Type: application/json' --post-data "$1" \\
+            "$OTLP_METRICS_ENDPOINT"
+    }
+
+    push_metrics() {
+        service="$1"
+        labels="$2"
+        shift 2
+        now="$(date +%s)000000000"
+        attributes=""
+        for label in $(echo "$labels" | tr ',' ' '); do
+            attribute="{\\"key\\":\\"${label%%=*}\\",\\"value\\":{\\"stringValue\\":\\"${label#*=}\\"}}"
+            attributes="${attributes:+$attributes,}$attribute"
+        done
+        metrics=""
+        for metric in "$@"; do
+            point="{\\"asDouble\\":${metric#*=},\\"timeUnixNano\\":\\"$now\\",\\"attributes\\":[$attributes]}"
+            metrics="${metrics:+$metrics,}{\\"name\\":\\"${metric%%=*}\\",\\"gauge\\":{\\"dataPoints\\":[$point]}}"
+        done
+        resource="{\\"attributes\\":[{\\"key\\":\\"service.name\\",\\"value\\":{\\"stringValue\\":\\"$service\\"}}]}"
+        otlp_post "{\\"resourceMetrics\\":[{\\"resource\\":$resource,\\"scopeMetrics\\":[{\\"metrics\\":[$metrics]}]}]}" \\
+            || echo 'Could not push metrics' >&2
+    }
+    """
+)
@@ -1,13 +1,19 @@
 import atexit
+import dataclasses
 import enum
+import hashlib
 import os
 import socket
 import subprocess
 import tempfile
+import threading
 import time
+import typing as t
 
 import pulumi as p
-import pulumi_kubernetes as k8s
+
+if t.TYPE_CHECKING:
+    import pulumi_kubernetes as k8s
 
 
 class PortForwardError(RuntimeError):
@@ -21,8 +27,172 @@ class ResourceType(enum.StrEnum):
     STATEFULSET = 'statefulset'
 
 
+def _allocate_local_port() -> int:
+    """
+    Let the OS pick a free local port.
+    """
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def _port_is_open(port: int) -> bool:
+    try:
+        with socket.create_connection(('localhost', port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+@dataclasses.dataclass
+class PortForward:
+    process: subprocess.Popen
+    local_port: int
+    setup_seconds: float
+
+
+class PortForwardManager:
+    """
+    Keeps track of the port forwards of this program so that they can be shared.
+
+    Forwards are deduplicated by kubeconfig, namespace, resource and target port, so several
+    providers connecting to the same database share one tunnel. Each kubeconfig is written to a
+    temporary file only once.
+    """
+
+    def __init__(self, timeout_seconds: float = 30.0):
+        self.timeout_seconds = timeout_seconds
+        self._lock = threading.Lock()
+        self._forwards: dict[tuple[str, str, str, str, str], PortForward] = {}
+        self._kubeconfig_files: dict[str, str] = {}
+
+    def _get_kubeconfig_file(self, kubeconfig: str) -> tuple[str, str]:
+        kubeconfig_hash = hashlib.sha256(kubeconfig.encode()).hexdigest()
+        if kubeconfig_hash not in self._kubeconfig_files:
+            # Note that we delete the tempfile after the program exits to give
+            # kubectl enough time to read the file.
+            with tempfile.NamedTemporaryFile(delete=False) as tmp_kubeconfig_file:
+                tmp_kubeconfig_file.write(kubeconfig.encode())
+            atexit.register(os.unlink, tmp_kubeconfig_file.name)
+            self._kubeconfig_files[kubeconfig_hash] = tmp_kubeconfig_file.name
+        return kubeconfig_hash, self._kubeconfig_files[kubeconfig_hash]
+
+    def _wait_until_ready(self, process: subprocess.Popen, local_port: int) -> None:
+        """
+        Wait for the port forward with exponential backoff between connection attempts.
+        """
+        start = time.monotonic()
+        delay = 0.01
+        while True:
+            if process.poll() is not None:
+                raise PortForwardError('Port forward process exited unexpectedly')
+            if _port_is_open(local_port):
+                return
+            if time.monotonic() - start > self.timeout_seconds:
+                process.terminate()
+                raise PortForwardError('Timed out waiting for port forward to be established')
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def forward(
+        self,
+        kubeconfig: str,
+        namespace: str,
+        resource_type: ResourceType,
+        resource_name: str,
+        target_port: int | str,
+        local_port: int | None = None,
+        silent: bool = True,
+    ) -> int:
+        """
+        Return the local port of a (possibly already running) port forward.
+
+        Args:
+            kubeconfig: The kubeconfig content used to connect to the cluster.
+            namespace: The namespace of the resource.
+            resource_type: The type of the resource to forward to.
+            resource_name: The name of the resource to forward.
+            target_port: The target port (or port name) of the resource.
+            local_port: The local port to use, allocated automatically if not set.
+            silent: Whether to suppress stdout.
+
+        Returns:
+            The local port of the port forward.
+        """
+        with self._lock:
+            kubeconfig_hash, kubeconfig_file = self._get_kubeconfig_file(kubeconfig)
+            key = (kubeconfig_hash, namespace, str(resource_type), resource_name, str(target_port))
+
+            existing = self._forwards.get(key)
+            if (
+                existing
+                and existing.process.poll() is None
+                and local_port in {None, existing.local_port}
+            ):
+                p.log.debug(
+                    f'Reusing port forward to {resource_type}/{resource_name} '
+                    f'on localhost:{existing.local_port}'
+                )
+                return existing.local_port
+
+            if local_port is None:
+                local_port = _allocate_local_port()
+
+            # Perform the port forward.
+            start = time.monotonic()
+            process = subprocess.Popen(
+                [
+                    'kubectl',
+                    '--namespace',
+                    namespace,
+                    'port-forward',
+                    f'{resource_type}/{resource_name}',
+                    f'{local_port}:{target_port}',
+                ],
+                env={**os.environ, 'KUBECONFIG': kubeconfig_file},
+                stdout=subprocess.DEVNULL if silent else None,
+            )
+            self._wait_until_ready(process, local_port)
+
+            forward = PortForward(
+                process=process,
+                local_port=local_port,
+                setup_seconds=time.monotonic() - start,
+            )
+            self._forwards[key] = forward
+            p.log.info(
+                f'Port forward to {resource_type}/{resource_name} ready on '
+                f'localhost:{local_port} after {forward.setup_seconds:.2f}s'
+            )
+
+            # Note: We don't handle termination of the process because the pulumi-language-python
+            # process will be terminated before resource deletion is done by pulumi. Therefore we
+            # need to just let the process run. Pulumi in the end will terminate all child
+            # processes anyway.
+            return local_port
+
+    def close(self) -> None:
+        """
+        Stop all port forwards, e.g. in scripts which do not run as a Pulumi program.
+        """
+        with self._lock:
+            forwards, self._forwards = self._forwards, {}
+
+        for forward in forwards.values():
+            forward.process.terminate()
+        for forward in forwards.values():
+            try:
+                forward.process.wait(timeout=self.timeout_seconds)
+            except subprocess.TimeoutExpired:
+                forward.process.kill()
+                forward.process.wait()
+
+
+port_forward_manager = PortForwardManager()
+
+
 def ensure_port_forward(
-    local_port: p.Input[int],
+    local_port: p.Input[int] | None,
     namespace: p.Input[str],
     resource_type: ResourceType,
     resource_name: p.Input[str],
@@ -35,7 +205,7 @@ def ensure_port_forward(
     Ensure that a port forward is established to the specified resource.
 
     Args:
-        local_port: The local port to forward to the resource.
+        local_port: The local port to forward to the resource, allocated automatically if None.
         namespace: The namespace of the resource.
         resource_type: The type of the resource to forward to.
         resource_name: The name of the resource to forward
@@ -45,7 +215,8 @@ def ensure_port_forward(
         silent: Whether to suppress stdout.
 
     Returns:
-        The local port given in local_port.
+        The local port of the port forward. On skipped dry runs this is local_port, or 0 if it
+        was to be allocated automatically.
     """
 
     def callback(args) -> int:
@@ -59,56 +230,18 @@ def ensure_port_forward(
         silent = args['silent']
 
         if skip_on_dry_run and p.runtime.is_dry_run():
-            return local_port
-
-        # Create a temporary kubeconfig file to use for the port forward.
-        # Note that we delete the tempfile after the program exits to give
-        # kubectl enough time to read the file.
-        tmp_kubeconfig_file = tempfile.NamedTemporaryFile(delete=False)
-        atexit.register(os.unlink, tmp_kubeconfig_file.name)
-
-        # Write the kubeconfig file to the temporary file.
-        tmp_kubeconfig_file.write(kubeconfig.encode())
-        tmp_kubeconfig_file.flush()
-
-        # Perform the port forward.
-        extra_args = {}
-        if silent:
-            extra_args['stdout'] = subprocess.DEVNULL
-        process = subprocess.Popen(
-            [
-                'kubectl',
-                '--namespace',
-                namespace,
-                'port-forward',
-                f'{resource_type}/{resource_name}',
-                f'{local_port}:{target_port}',
-            ],
-            env={**os.environ, 'KUBECONFIG': tmp_kubeconfig_file.name},
-            **extra_args,
+            return local_port or 0
+
+        return port_forward_manager.forward(
+            kubeconfig,
+            namespace,
+            resource_type,
+            resource_name,
+            target_port,
+            local_port=local_port,
+            silent=silent,
         )
 
-        # Wait for the port forward to be established.
-        start = time.monotonic()
-        while True:
-            process.poll()
-            if process.returncode is not None:
-                raise PortForwardError('Port forward process exited unexpectedly')
-            try:
-                s = socket.socket()
-                s.connect(('localhost', local_port))
-                s.close()
-                break
-            except Exception:
-                if time.monotonic() - start > 30:
-                    raise PortForwardError('Timed out waiting for port forward to be established')
-                time.sleep(0.1)
-
-        # Note: We don't handle termination of the process because the pulumi-language-python
-        # process will be terminated before resource deletion is done by pulumi. Therefore we need
-        # to just let the process run. Pulumi in the end will terminate all child processes anyway.
-        return local_port
-
     return p.Output.all(
         local_port=local_port,
         namespace=namespace,
@@ -1,9 +1,27 @@
+import base64
+import datetime
+import time
 import typing as t
+import urllib.parse
 
 import pulumi as p
 import pulumi_kubernetes as k8s
+import pulumi_random
 
-from utils.model import PostgresBackupConfig
+from utils.model import (
+    BarmanCompression,
+    PostgresBackupConfig,
+    PostgresClusterConfig,
+    PostgresPoolerConfig,
+)
+from utils.postgres_maintenance import create_maintenance_cronjob
+from utils.postgres_monitoring import custom_queries
+from utils.postgres_tuning import (
+    durability_parameters,
+    parse_memory_parameter,
+    parse_quantity,
+    tune_parameters,
+)
 
 
 def _deep_merge(base: dict, overrides: dict) -> dict:
@@ -25,14 +43,48 @@ def _deep_merge(base: dict, overrides: dict) -> dict:
     return result
 
 
+# First plugin-barman-cloud chart versions shipping barman-cloud with the given compression
+_BARMAN_COMPRESSION_MIN_PLUGIN_VERSION = {
+    BarmanCompression.LZ4: (0, 4, 0),
+    BarmanCompression.ZSTD: (0, 4, 0),
+}
+
+
+def _parse_version(version: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in version.removeprefix('v').split('-')[0].split('.'))
+
+
+def _validate_backup_compression(
+    backup_config: PostgresBackupConfig, plugin_version: str | None
+) -> None:
+    """Make sure the installed Barman Cloud plugin supports the configured compression."""
+    if not plugin_version:
+        return
+
+    for setting, compression in (
+        ('wal-compression', backup_config.wal_compression),
+        ('data-compression', backup_config.data_compression),
+    ):
+        if compression is None:
+            continue
+        min_version = _BARMAN_COMPRESSION_MIN_PLUGIN_VERSION.get(compression)
+        if min_version and _parse_version(plugin_version) < min_version:
+            raise ValueError(
+                f'{setting} {compression} requires plugin-barman-cloud '
+                f'{".".join(map(str, min_version))} or later, installed is {plugin_version}'
+            )
+
+
 def _create_backup_objectstore(
     namespace_name: p.Input[str],
     cluster_name: p.Input[str],
+    backup_config: PostgresBackupConfig,
     k8s_opts: p.ResourceOptions,
 ) -> k8s.apiextensions.CustomResource:
     """Create ObjectStore for Barman Cloud Plugin to use IDrive e2 S3 storage."""
 
-    backup_config = p.Config().require_object('postgres-backup')
+    store_config = p.Config().require_object('postgres-backup')
+    _validate_backup_compression(backup_config, store_config.get('barman-plugin-version'))
 
     # Create secret for S3 credentials
     backup_secret = k8s.core.v1.Secret(
@@ -41,12 +93,16 @@ def _create_backup_objectstore(
             'namespace': namespace_name,
         },
         string_data={
-            'access-key-id': backup_config['access-key-id'],
-            'secret-access-key': backup_config['secret-access-key'],
+            'access-key-id': store_config['access-key-id'],
+            'secret-access-key': store_config['secret-access-key'],
         },
         opts=k8s_opts,
     )
 
+    data_config: dict[str, t.Any] = {'jobs': backup_config.data_jobs}
+    if backup_config.data_compression:
+        data_config['compression'] = str(backup_config.data_compression)
+
     # Create ObjectStore resource for Barman Cloud Plugin
     return k8s.apiextensions.CustomResource(
         'idrive-e2-store',
@@ -58,9 +114,9 @@ def _create_backup_objectstore(
         spec={
             'configuration': {
                 'destinationPath': p.Output.concat(
-                    backup_config['destination-path'], '/', namespace_name, '/', cluster_name
+                    store_config['destination-path'], '/', namespace_name, '/', cluster_name
                 ),
-                'endpointURL': backup_config['endpoint-url'],
+                'endpointURL': store_config['endpoint-url'],
                 's3Credentials': {
                     'accessKeyId': {
                         'name': backup_secret.metadata.name,
@@ -72,14 +128,217 @@ def _create_backup_objectstore(
                     },
                 },
                 'wal': {
-                    'compression': 'gzip',
+                    'compression': str(backup_config.wal_compression),
+                    'maxParallel': backup_config.wal_max_parallel,
                 },
+                'data': data_config,
             },
         },
         opts=k8s_opts,
     )
 
 
+def _pooled_secret_data(app_secret_data: dict[str, str], host: str) -> dict[str, str]:
+    """Build connection details for the pooler from the app secret of the cluster."""
+    app_secret = {key: base64.b64decode(value).decode() for key, value in app_secret_data.items()}
+    username, password, dbname = (
+        app_secret['username'],
+        app_secret['password'],
+        app_secret['dbname'],
+    )
+    return {
+        'username': username,
+        'password': password,
+        'dbname': dbname,
+        'host': host,
+        'port': '5432',
+        'uri': f'postgresql://{username}:{urllib.parse.quote(password, safe="")}@{host}:5432/{dbname}',
+    }
+
+
+def _create_pooler(
+    namespace_name: p.Input[str],
+    cluster: k8s.apiextensions.CustomResource,
+    cluster_name: str,
+    pooler_config: PostgresPoolerConfig,
+    k8s_opts: p.ResourceOptions,
+) -> p.Output[str]:
+    """Create PgBouncer pooler for the cluster.
+
+    Clients authenticate with the regular app credentials, CloudNativePG sets up the auth query
+    of PgBouncer. The connection details for the pooler are published in a secret with the same
+    keys as the app secret.
+
+    Returns:
+        Name of the secret with the pooled connection details.
+    """
+    pooler_name = f'{cluster_name}-pooler-rw'
+
+    pooler_template: dict[str, t.Any] = {}
+    if pooler_config.resources is not None:
+        pooler_template = {
+            'spec': {
+                'containers': [
+                    {
+                        'name': 'pgbouncer',
+                        'resources': pooler_config.resources.to_resource_requirements(),
+                    },
+                ],
+            },
+        }
+
+    k8s.apiextensions.CustomResource(
+        pooler_name,
+        api_version='postgresql.cnpg.io/v1',
+        kind='Pooler',
+        metadata={
+            'name': pooler_name,
+            'namespace': namespace_name,
+        },
+        spec={
+            'cluster': {
+                'name': cluster_name,
+            },
+            'instances': pooler_config.instances,
+            'type': 'rw',
+            'pgbouncer': {
+                'poolMode': str(pooler_config.pool_mode),
+                'parameters': {
+                    'default_pool_size': str(pooler_config.default_pool_size),
+                    'max_client_conn': str(pooler_config.max_client_conn),
+                },
+            },
+            **({'template': pooler_template} if pooler_template else {}),
+        },
+        opts=p.ResourceOptions.merge(k8s_opts, p.ResourceOptions(depends_on=[cluster])),
+    )
+
+    # Expose pool saturation metrics of PgBouncer
+    k8s.apiextensions.CustomResource(
+        f'{pooler_name}-monitor',
+        api_version='monitoring.coreos.com/v1',
+        kind='PodMonitor',
+        metadata={
+            'name': pooler_name,
+            'namespace': namespace_name,
+        },
+        spec={
+            'selector': {
+                'matchLabels': {
+                    'cnpg.io/poolerName': pooler_name,
+                },
+            },
+            'podMetricsEndpoints': [
+                {
+                    'port': 'metrics',
+                },
+            ],
+        },
+        opts=k8s_opts,
+    )
+
+    # Read the app secret once the cluster has created it
+    app_secret = k8s.core.v1.Secret.get(
+        f'{cluster_name}-app-secret',
+        p.Output.all(namespace_name, cluster.metadata).apply(  # type: ignore[reportAttributeAccessIssue]
+            lambda args: f'{args[0]}/{cluster_name}-app'
+        ),
+        opts=k8s_opts,
+    )
+
+    pooled_secret = k8s.core.v1.Secret(
+        f'{cluster_name}-pooler-app',
+        metadata={
+            'name': f'{cluster_name}-pooler-app',
+            'namespace': namespace_name,
+        },
+        string_data=p.Output.secret(
+            app_secret.data.apply(lambda data: _pooled_secret_data(data, pooler_name))
+        ),
+        opts=k8s_opts,
+    )
+    return pooled_secret.metadata.apply(lambda m: m['name'])  # type: ignore[reportAttributeAccessIssue]
+
+
+def _validate_huge_pages(spec: dict[str, t.Any]) -> None:
+    """With huge_pages=on PostgreSQL refuses to start if shared memory does not fit."""
+    parameters = spec['postgresql']['parameters']
+    if parameters.get('huge_pages') != 'on':
+        return
+
+    huge_pages = spec.get('resources', {}).get('limits', {}).get('hugepages-2Mi')
+    if huge_pages is None:
+        raise ValueError('huge_pages=on requires a hugepages-2Mi limit')
+
+    # 128MB is the default of PostgreSQL
+    shared_buffers = parameters.get('shared_buffers', '128MB')
+    if parse_quantity(huge_pages) < parse_memory_parameter(shared_buffers) * 1.1:
+        raise ValueError(
+            f'huge_pages {huge_pages} too small for shared_buffers {shared_buffers} plus overhead'
+        )
+
+
+class _ImportDurationProvider(p.dynamic.ResourceProvider):
+    """
+    Measures the bootstrap of a cluster once, when the resource is created right after it.
+    """
+
+    def create(self, props: dict[str, t.Any]) -> p.dynamic.CreateResult:
+        created = datetime.datetime.fromisoformat(props['created_at'])
+        # A cluster created before this update imported nothing now. Allow for clock skew between
+        # this machine and the API server.
+        seconds = None
+        if created.timestamp() >= props['update_start'] - 300:
+            seconds = (datetime.datetime.now(datetime.UTC) - created).total_seconds()
+            p.log.info(f'Cluster was bootstrapped with the import in {seconds:.0f}s')
+        return p.dynamic.CreateResult(id_=props['cluster_uid'], outs={**props, 'seconds': seconds})
+
+    def diff(
+        self,
+        _id: str,
+        _olds: dict[str, t.Any],
+        _news: dict[str, t.Any],
+    ) -> p.dynamic.DiffResult:
+        """
+        Only a new cluster is measured again, the update start changes on every run.
+        """
+        replaced = _olds['cluster_uid'] != _news['cluster_uid']
+        return p.dynamic.DiffResult(
+            changes=replaced,
+            replaces=['cluster_uid'] if replaced else [],
+            delete_before_replace=False,
+        )
+
+
+class _ImportDuration(p.dynamic.Resource):
+    """
+    Time from creating a cluster until it first became ready, including the import.
+
+    The cluster is only ready after the import, so creating this resource right after it measures
+    the import. The result is kept in the state, later updates do not measure it again.
+    """
+
+    seconds: p.Output[float | None]
+
+    def __init__(
+        self,
+        name: str,
+        cluster: k8s.apiextensions.CustomResource,
+        opts: p.ResourceOptions | None = None,
+    ):
+        super().__init__(
+            _ImportDurationProvider(),
+            name,
+            {
+                'cluster_uid': cluster.metadata.apply(lambda m: m['uid']),  # type: ignore[reportAttributeAccessIssue]
+                'created_at': cluster.metadata.apply(lambda m: m['creationTimestamp']),  # type: ignore[reportAttributeAccessIssue]
+                'update_start': time.time(),
+                'seconds': None,
+            },
+            opts,
+        )
+
+
 class PostgresDatabase(p.ComponentResource):
     def __init__(
         self,
@@ -87,7 +346,8 @@ class PostgresDatabase(p.ComponentResource):
         namespace_name: p.Input[str],
         k8s_provider: k8s.Provider,
         *,
-        local_port: int = 15432,
+        local_port: int | None = None,
+        config: PostgresClusterConfig | None = None,
         storage_size: str = '20Gi',
         storage_class: str = 'microk8s-hostpath',
         enable_superuser: bool = False,
@@ -103,6 +363,10 @@ class PostgresDatabase(p.ComponentResource):
         import_source_user: str | None = None,
         import_source_dbname: p.Input[str] | None = None,
         import_source_password_secret: tuple[p.Input[str], str] | None = None,
+        import_jobs: int = 1,
+        import_schema_without_data: bool = False,
+        import_relaxed_durability: bool = False,
+        top_statements: int = 20,
         spec_overrides: dict | None = None,
         opts: p.ResourceOptions | None = None,
     ):
@@ -113,8 +377,11 @@ class PostgresDatabase(p.ComponentResource):
             version: PostgreSQL major version to deploy, referenced by ClusterImageCatalogs.
             namespace_name: Kubernetes namespace for deployment.
             k8s_provider: Kubernetes provider instance.
-            local_port: Local port for port forwarding (default: 15432).
-            storage_size: Storage size for CloudNativePG backend (default: '20Gi').
+            local_port: Local port for port forwarding (default: None, allocated automatically).
+            config: Instances, resources, tuning, pooler and maintenance of the cluster, see
+                `PostgresClusterConfig` (default: one instance with fixed parameters).
+            storage_size: Storage size of each instance, replicas get a volume of the same size
+                as the primary (default: '20Gi').
             storage_class: Storage class for CloudNativePG backend (default: 'microk8s-hostpath').
             enable_superuser: Whether to enable superuser access (default: False).
             backup_enabled: Whether to enable automated backups (default: False).
@@ -126,12 +393,19 @@ class PostgresDatabase(p.ComponentResource):
             import_source_user: Username for connecting to source database.
             import_source_dbname: Database name on source to connect to (usually 'postgres').
             import_source_password_secret: Tuple of (secret_name, key) for source password.
+            import_jobs: Parallel jobs of pg_dump and pg_restore during import (default: 1).
+            import_schema_without_data: Import only the schema of the source database, e.g. to
+                test a migration. No data is loaded, neither now nor later (default: False).
+            import_relaxed_durability: Trade durability for write throughput while importing,
+                remove once the import is done (default: False).
+            top_statements: Number of statements exported with pg_stat_statements (default: 20).
             spec_overrides: Optional dict to override values in the cluster spec (deep merged).
             opts: Pulumi resource options.
         """
         super().__init__(f'lab:postgres:{name}', name, None, opts)
 
         k8s_opts = p.ResourceOptions(provider=k8s_provider, parent=self)
+        config = config or PostgresClusterConfig()
 
         # Use component name as cluster name to support multiple instances
         cluster_name = name
@@ -156,6 +430,14 @@ class PostgresDatabase(p.ComponentResource):
                     'externalCluster': import_source_name_final,
                 },
             }
+            if import_jobs > 1:
+                # CloudNativePG dumps in directory format, so both sides can run in parallel.
+                # pg_restore still creates the schema first, then loads data and builds indexes
+                # with the given number of jobs.
+                import_config['pgDumpExtraOptions'] = [f'--jobs={import_jobs}']
+                import_config['pgRestoreExtraOptions'] = [f'--jobs={import_jobs}']
+            if import_schema_without_data:
+                import_config['schemaOnly'] = True
             bootstrap_initdb['import'] = import_config
 
         version_spec: dict[str, t.Any]
@@ -176,19 +458,27 @@ class PostgresDatabase(p.ComponentResource):
             )
             version_spec = {'imageName': postgres_image}
 
+        # Memory and parallelism parameters, derived from the resources if given
+        tuning_parameters: dict[str, str] = {
+            'max_connections': '100',
+            'shared_buffers': '256MB',
+            'effective_cache_size': '1GB',
+            'maintenance_work_mem': '64MB',
+            'wal_buffers': '16MB',
+        }
+        if config.resources is not None:
+            tuning_parameters = tune_parameters(config.resources, config.workload)
+
         spec: dict = {
-            'instances': 1,
+            'instances': config.instances,
             'enableSuperuserAccess': enable_superuser,
             # PostgreSQL configuration
             'postgresql': {
                 'parameters': {
                     # Performance tuning for homelab environment
-                    'max_connections': '100',
-                    'shared_buffers': '256MB',
-                    'effective_cache_size': '1GB',
-                    'maintenance_work_mem': '64MB',
+                    **tuning_parameters,
+                    **durability_parameters(config.durability),
                     'checkpoint_completion_target': '0.9',
-                    'wal_buffers': '16MB',
                     'default_statistics_target': '100',
                     'random_page_cost': '1.1',
                     'effective_io_concurrency': '200',
@@ -213,6 +503,73 @@ class PostgresDatabase(p.ComponentResource):
             **version_spec,
         }
 
+        if config.resources is not None:
+            spec['resources'] = config.resources.to_resource_requirements()
+
+        if config.huge_pages is not None:
+            # Kubernetes only accepts huge pages next to CPU or memory requests
+            if config.resources is None:
+                raise ValueError('resources must be provided to request huge pages')
+
+            spec['postgresql']['parameters']['huge_pages'] = 'on'
+            for requirement in ('requests', 'limits'):
+                spec['resources'][requirement]['hugepages-2Mi'] = config.huge_pages
+
+        # Cache hit ratio, bloat and autovacuum lag on top of the default metrics
+        queries_config_map = k8s.core.v1.ConfigMap(
+            f'{cluster_name}-monitoring-queries',
+            metadata={
+                'namespace': namespace_name,
+                'labels': {
+                    # Lets CloudNativePG reload the queries on changes
+                    'cnpg.io/reload': '',
+                },
+            },
+            data={
+                'queries.yaml': custom_queries(
+                    pg_stat_statements=config.pg_stat_statements, top_statements=top_statements
+                ),
+            },
+            opts=k8s_opts,
+        )
+        spec['monitoring'] = {
+            'customQueriesConfigMap': [
+                {'name': queries_config_map.metadata.name, 'key': 'queries.yaml'},
+            ],
+        }
+
+        if config.pg_stat_statements:
+            # Setting pg_stat_statements parameters makes CloudNativePG add the library to
+            # shared_preload_libraries, also when spec_overrides set other libraries
+            spec['postgresql']['parameters'].update(
+                {
+                    'pg_stat_statements.max': '10000',
+                    'pg_stat_statements.track': 'top',
+                }
+            )
+            # The metrics exporter reads the view from the postgres database
+            bootstrap_initdb['postInitSQL'] = ['CREATE EXTENSION IF NOT EXISTS pg_stat_statements;']
+
+        if import_databases and import_relaxed_durability:
+            # Bulk load settings: no waiting for WAL flushes and fewer checkpoints. A crash during
+            # the import loses the last transactions, the import is simply repeated then.
+            spec['postgresql']['parameters'].update(
+                {
+                    'synchronous_commit': 'off',
+                    'max_wal_size': '8GB',
+                    'checkpoint_timeout': '30min',
+                }
+            )
+
+        if config.instances > 1:
+            # Spread replicas across nodes where possible, preferred so that a single node
+            # cluster can still schedule all instances
+            spec['affinity'] = {
+                'enablePodAntiAffinity': True,
+                'podAntiAffinityType': 'preferred',
+                'topologyKey': 'kubernetes.io/hostname',
+            }
+
         # Add external clusters configuration if import is enabled
         if import_databases and import_source_host:
             import_source_name_final = import_source_name or 'source'
@@ -236,7 +593,9 @@ class PostgresDatabase(p.ComponentResource):
 
         # Add backup configuration if enabled
         if backup_enabled and backup_config is not None:
-            object_store = _create_backup_objectstore(namespace_name, cluster_name, k8s_opts)
+            object_store = _create_backup_objectstore(
+                namespace_name, cluster_name, backup_config, k8s_opts
+            )
             spec['plugins'] = [
                 {
                     'name': 'barman-cloud.cloudnative-pg.io',
@@ -250,6 +609,7 @@ class PostgresDatabase(p.ComponentResource):
         # Apply spec overrides if provided
         if spec_overrides:
             spec = _deep_merge(spec, spec_overrides)
+        _validate_huge_pages(spec)
 
         # Create PostgreSQL cluster using CloudNativePG
         cluster = k8s.apiextensions.CustomResource(
@@ -268,6 +628,14 @@ class PostgresDatabase(p.ComponentResource):
             opts=k8s_opts,
         )
 
+        self.import_duration_seconds: p.Output[float | None] | None = None
+        if import_databases:
+            self.import_duration_seconds = _ImportDuration(
+                f'{cluster_name}-import-duration',
+                cluster,
+                opts=p.ResourceOptions(parent=self),
+            ).seconds
+
         # Create ScheduledBackup if backup is enabled
         if backup_enabled and backup_config is not None:
             cron = backup_cron or backup_config.cron_schedule
@@ -322,6 +690,23 @@ class PostgresDatabase(p.ComponentResource):
         # Derive the secret name from cluster metadata to ensure data-driven dependency
         self.secret_name = cluster.metadata.apply(lambda _: f'{cluster_name}-app')  # type: ignore[reportAttributeAccessIssue]
 
+        if config.maintenance is not None:
+            create_maintenance_cronjob(
+                f'{cluster_name}-maintenance',
+                namespace_name,
+                cluster_name,
+                'app',
+                self.secret_name,
+                config.maintenance,
+                k8s_opts,
+            )
+
+        # Services created by CloudNativePG: '-rw' points to the primary, '-ro' to the replicas
+        # only and '-r' to any instance. Without replicas '-ro' has no endpoints.
+        self.host = cluster.metadata.apply(lambda _: f'{cluster_name}-rw')  # type: ignore[reportAttributeAccessIssue]
+        self.read_only_host = cluster.metadata.apply(lambda _: f'{cluster_name}-ro')  # type: ignore[reportAttributeAccessIssue]
+        self.read_host = cluster.metadata.apply(lambda _: f'{cluster_name}-r')  # type: ignore[reportAttributeAccessIssue]
+
         if enable_superuser:
             self.superuser_secret_name = cluster.metadata.apply(  # type: ignore[reportAttributeAccessIssue]
                 lambda _: f'{cluster_name}-superuser'
@@ -329,4 +714,220 @@ class PostgresDatabase(p.ComponentResource):
         else:
             self.superuser_secret_name = None
 
+        if config.pooler is not None:
+            self.pooler_secret_name = _create_pooler(
+                namespace_name, cluster, cluster_name, config.pooler, k8s_opts
+            )
+        else:
+            self.pooler_secret_name = None
+
+        self.register_outputs(
+            {'import_duration_seconds': self.import_duration_seconds}
+            if self.import_duration_seconds is not None
+            else {}
+        )
+
+
+def _shared_secret_data(
+    database: str, password: p.Output[str], host: p.Output[str]
+) -> dict[str, p.Input[str]]:
+    """Connection details with the same keys as the app secret of a dedicated cluster."""
+    return {
+        'username': database,
+        'password': password,
+        'dbname': database,
+        'host': host,
+        'port': '5432',
+        'uri': p.Output.format('postgresql://{}:{}@{}:5432/{}', database, password, host, database),
+    }
+
+
+class SharedPostgresDatabase:
+    """Database of one app in a SharedPostgresCluster.
+
+    Exposes the same attributes as PostgresDatabase that apps use to connect, so a service can
+    switch between a dedicated and a shared cluster without further changes.
+    """
+
+    def __init__(
+        self,
+        secret_name: p.Output[str],
+        host: p.Output[str],
+        read_only_host: p.Output[str],
+        read_host: p.Output[str],
+        pooler_secret_name: p.Output[str] | None = None,
+    ):
+        self.secret_name = secret_name
+        self.host = host
+        self.read_only_host = read_only_host
+        self.read_host = read_host
+        self.superuser_secret_name = None
+        self.pooler_secret_name = pooler_secret_name
+
+
+class SharedPostgresCluster(p.ComponentResource):
+    def __init__(
+        self,
+        name: str,
+        namespace_name: p.Input[str],
+        k8s_provider: k8s.Provider,
+        databases: dict[str, p.Input[str]],
+        *,
+        opts: p.ResourceOptions | None = None,
+        **postgres_options: t.Any,
+    ):
+        """Initialize a CloudNativePG cluster hosting the databases of several apps.
+
+        Each app gets its own database and login role, managed declaratively by
+        CloudNativePG, instead of running a dedicated cluster with its own shared buffers, WAL
+        archiver and monitoring.
+
+        Args:
+            name: Logical name of the component, also used as cluster name.
+            namespace_name: Kubernetes namespace of the cluster.
+            k8s_provider: Kubernetes provider instance.
+            databases: Mapping of database name (also used as owner role) to the namespace
+                of the app using it. The connection secret is created in that namespace.
+            opts: Pulumi resource options.
+            postgres_options: Further options of PostgresDatabase for the cluster, e.g.
+                postgres_version, config or backup_config. The maintenance of the config
+                schedules a maintenance job for each of the databases.
+        """
+        super().__init__(f'lab:shared_postgres:{name}', name, None, opts)
+
+        k8s_opts = p.ResourceOptions(provider=k8s_provider, parent=self)
+
+        role_secrets = {}
+        passwords = {}
+        for database in databases:
+            passwords[database] = pulumi_random.RandomPassword(
+                f'{name}-{database}-password',
+                length=32,
+                special=False,
+                opts=p.ResourceOptions(parent=self),
+            ).result
+
+            # Secret referenced by the managed role, has to live next to the cluster
+            role_secrets[database] = k8s.core.v1.Secret(
+                f'{name}-{database}-role',
+                metadata={
+                    'name': f'{name}-{database}-role',
+                    'namespace': namespace_name,
+                    'labels': {'cnpg.io/reload': 'true'},
+                },
+                type='kubernetes.io/basic-auth',
+                string_data={
+                    'username': database,
+                    'password': passwords[database],
+                },
+                opts=k8s_opts,
+            )
+
+        spec_overrides = postgres_options.pop('spec_overrides', None) or {}
+        config: PostgresClusterConfig = (
+            postgres_options.pop('config', None) or PostgresClusterConfig()
+        )
+        maintenance = config.maintenance
+        managed_roles = {
+            'managed': {
+                'roles': [
+                    {
+                        'name': database,
+                        'ensure': 'present',
+                        'login': True,
+                        'passwordSecret': {'name': role_secret.metadata.name},
+                    }
+                    for database, role_secret in role_secrets.items()
+                ],
+            },
+        }
+
+        self.cluster = PostgresDatabase(
+            name,
+            namespace_name,
+            k8s_provider,
+            config=config.model_copy(update={'maintenance': None}),
+            spec_overrides=_deep_merge(managed_roles, spec_overrides),
+            opts=p.ResourceOptions(parent=self),
+            **postgres_options,
+        )
+
+        # Same services as PostgresDatabase, qualified as the apps run in other namespaces
+        host = p.Output.format('{}-rw.{}.svc', name, namespace_name)
+        read_only_host = p.Output.format('{}-ro.{}.svc', name, namespace_name)
+        read_host = p.Output.format('{}-r.{}.svc', name, namespace_name)
+        # The pooler forwards to the primary and authenticates every role of the cluster
+        pooler_host = (
+            p.Output.format('{}-pooler-rw.{}.svc', name, namespace_name)
+            if config.pooler is not None
+            else None
+        )
+
+        self.databases: dict[str, SharedPostgresDatabase] = {}
+        for database, app_namespace in databases.items():
+            database_resource = k8s.apiextensions.CustomResource(
+                f'{name}-{database}',
+                api_version='postgresql.cnpg.io/v1',
+                kind='Database',
+                metadata={
+                    'name': f'{name}-{database}',
+                    'namespace': namespace_name,
+                },
+                spec={
+                    'name': database,
+                    'owner': database,
+                    'cluster': {
+                        'name': name,
+                    },
+                    'ensure': 'present',
+                },
+                opts=p.ResourceOptions.merge(
+                    k8s_opts, p.ResourceOptions(depends_on=[self.cluster])
+                ),
+            )
+
+            if maintenance is not None:
+                create_maintenance_cronjob(
+                    f'{name}-{database}-maintenance',
+                    namespace_name,
+                    name,
+                    database,
+                    role_secrets[database].metadata.name,
+                    maintenance,
+                    p.ResourceOptions.merge(
+                        k8s_opts, p.ResourceOptions(depends_on=[database_resource])
+                    ),
+                )
+
+            app_secret = k8s.core.v1.Secret(
+                f'{name}-{database}-app',
+                metadata={
+                    'name': f'{name}-{database}-app',
+                    'namespace': app_namespace,
+                },
+                string_data=_shared_secret_data(database, passwords[database], host),
+                opts=k8s_opts,
+            )
+
+            pooler_secret_name = None
+            if pooler_host is not None:
+                pooler_secret = k8s.core.v1.Secret(
+                    f'{name}-{database}-pooler-app',
+                    metadata={
+                        'name': f'{name}-{database}-pooler-app',
+                        'namespace': app_namespace,
+                    },
+                    string_data=_shared_secret_data(database, passwords[database], pooler_host),
+                    opts=k8s_opts,
+                )
+                pooler_secret_name = pooler_secret.metadata.apply(lambda m: m['name'])  # type: ignore[reportAttributeAccessIssue]
+
+            self.databases[database] = SharedPostgresDatabase(
+                secret_name=app_secret.metadata.apply(lambda m: m['name']),  # type: ignore[reportAttributeAccessIssue]
+                host=host,
+                read_only_host=read_only_host,
+                read_host=read_host,
+                pooler_secret_name=pooler_secret_name,
+            )
+
         self.register_outputs({})
@@ -0,0 +1,226 @@
+import textwrap
+
+import pulumi as p
+import pulumi_kubernetes as k8s
+
+from utils.model import PostgresMaintenanceConfig
+from utils.otlp import OTLP_METRICS_ENDPOINT, PUSH_METRICS_FUNCTIONS
+
+# Runs after the shared push_metrics functions
+_MAINTENANCE_SCRIPT = textwrap.dedent(
+    """\
+    psql_run() {
+        psql --no-psqlrc --quiet --set ON_ERROR_STOP=1 "$@"
+    }
+
+    psql_value() {
+        psql_run --tuples-only --no-align --command "$1"
+    }
+
+    start=$(date +%s)
+    size_before=$(psql_value 'SELECT pg_database_size(current_database())')
+
+    echo 'Applying table settings'
+    psql_run --file /scripts/table-settings.sql
+
+    # Queried into variables first, set -e misses failed command substitutions in a heredoc
+    tables=$(psql_value "
+        SELECT format('%I.%I', schemaname, relname)
+        FROM pg_stat_user_tables
+        WHERE n_dead_tup::float / greatest(n_live_tup + n_dead_tup, 1) >= $VACUUM_DEAD_RATIO
+        ORDER BY n_dead_tup DESC
+    ")
+    vacuumed=0
+    while IFS= read -r table; do
+        [ -n "$table" ] || continue
+        echo "Vacuuming $table"
+        psql_run --command "VACUUM (ANALYZE) $table"
+        vacuumed=$((vacuumed + 1))
+    done <<EOF
+    $tables
+    EOF
+
+    # Estimate of the B-tree size from row count and column widths, pgstattuple would need
+    # superuser rights and a full index scan
+    indexes=$(psql_value "
+        WITH indexes AS (
+            SELECT
+                format('%I.%I', n.nspname, c.relname) AS name,
+                c.relpages,
+                c.reltuples,
+                (
+                    SELECT coalesce(sum(s.avg_width), 0)
+                    FROM pg_attribute a
+                    JOIN pg_stats s
+                        ON s.schemaname = n.nspname AND s.tablename = t.relname
+                        AND s.attname = a.attname
+                    WHERE a.attrelid = i.indrelid AND a.attnum = ANY (i.indkey)
+                ) AS data_width
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_am am ON am.oid = c.relam
+            WHERE am.amname = 'btree' AND i.indisvalid
+                AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+                -- Never analyzed tables report -1 rows
+                AND c.reltuples >= 0
+        )
+        SELECT name
+        FROM indexes
+        -- Without column statistics the estimate would call every index bloated
+        WHERE data_width > 0
+            AND relpages::bigint * current_setting('block_size')::bigint
+                >= $REINDEX_MIN_SIZE_MB * 1024 * 1024
+            AND 1 - ceil(
+                reltuples * (data_width + 12)
+                / (current_setting('block_size')::int * 0.9 - 24)
+            ) / greatest(relpages, 1) >= $REINDEX_BLOAT_RATIO
+    ")
+    reindexed=0
+    failed=0
+    while IFS= read -r index; do
+        [ -n "$index" ] || continue
+        echo "Rebuilding $index"
+        if psql_run --command "REINDEX INDEX CONCURRENTLY $index"; then
+            reindexed=$((reindexed + 1))
+        else
+            failed=$((failed + 1))
+        fi
+    done <<EOF
+    $indexes
+    EOF
+
+    size_after=$(psql_value 'SELECT pg_database_size(current_database())')
+    reclaimed=$((size_before - size_after))
+    if [ "$reclaimed" -lt 0 ]; then
+        reclaimed=0
+    fi
+    duration=$(($(date +%s) - start))
+
+    echo "Vacuumed $vacuumed tables, rebuilt $reindexed indexes, reclaimed $reclaimed bytes in ${duration}s"
+    push_metrics postgres-maintenance "cluster=$CLUSTER_NAME,database=$PGDATABASE" \\
+        "postgres_maintenance_duration_seconds=$duration" \\
+        "postgres_maintenance_reclaimed_bytes=$reclaimed" \\
+        "postgres_maintenance_vacuumed_tables=$vacuumed" \\
+        "postgres_maintenance_reindexed_indexes=$reindexed" \\
+        "postgres_maintenance_failed_reindexes=$failed" \\
+        "postgres_maintenance_last_run_timestamp_seconds=$(date +%s)"
+
+    [ "$failed" -eq 0 ]
+    """
+)
+
+
+def _table_settings_sql(table_settings: dict[str, dict[str, str]]) -> str:
+    statements = []
+    for table, settings in table_settings.items():
+        options = ', '.join(f'{key} = {value}' for key, value in settings.items())
+        statements.append(f'ALTER TABLE {table} SET ({options});\n')
+    return ''.join(statements)
+
+
+def create_maintenance_cronjob(
+    name: str,
+    namespace_name: p.Input[str],
+    cluster_name: str,
+    dbname: p.Input[str],
+    credentials_secret_name: p.Input[str],
+    maintenance_config: PostgresMaintenanceConfig,
+    k8s_opts: p.ResourceOptions,
+) -> k8s.batch.v1.CronJob:
+    """Create a CronJob vacuuming hot tables and rebuilding bloated indexes of a database.
+
+    Runtime, reclaimed bytes and the number of maintained tables and indexes are pushed to the
+    OTLP receiver of Alloy after each run.
+
+    Args:
+        name: Name of the CronJob and its ConfigMap.
+        namespace_name: Namespace of the PostgreSQL cluster.
+        cluster_name: Name of the CloudNativePG cluster, connects to its primary.
+        dbname: Database to maintain.
+        credentials_secret_name: Secret with `username` and `password` of the database owner.
+        maintenance_config: Schedule, thresholds and table settings.
+        k8s_opts: Kubernetes resource options.
+
+    Returns:
+        The maintenance CronJob.
+    """
+    script_config_map = k8s.core.v1.ConfigMap(
+        f'{name}-script',
+        metadata={'namespace': namespace_name},
+        data={
+            'maintenance.sh': f'#!/bin/sh\nset -eu\n\n{PUSH_METRICS_FUNCTIONS}\n{_MAINTENANCE_SCRIPT}',
+            'table-settings.sql': _table_settings_sql(maintenance_config.table_settings),
+        },
+        opts=k8s_opts,
+    )
+
+    env: list[k8s.core.v1.EnvVarArgsDict] = [
+        {'name': 'CLUSTER_NAME', 'value': cluster_name},
+        {'name': 'PGHOST', 'value': f'{cluster_name}-rw'},
+        {'name': 'PGDATABASE', 'value': dbname},
+        {
+            'name': 'PGUSER',
+            'value_from': {
+                'secret_key_ref': {'name': credentials_secret_name, 'key': 'username'},
+            },
+        },
+        {
+            'name': 'PGPASSWORD',
+            'value_from': {
+                'secret_key_ref': {'name': credentials_secret_name, 'key': 'password'},
+            },
+        },
+        {'name': 'VACUUM_DEAD_RATIO', 'value': str(maintenance_config.vacuum_dead_ratio)},
+        {'name': 'REINDEX_BLOAT_RATIO', 'value': str(maintenance_config.reindex_bloat_ratio)},
+        {'name': 'REINDEX_MIN_SIZE_MB', 'value': str(maintenance_config.reindex_min_size_mb)},
+        {'name': 'OTLP_METRICS_ENDPOINT', 'value': OTLP_METRICS_ENDPOINT},
+    ]
+
+    container: k8s.core.v1.ContainerArgsDict = {
+        'name': 'maintenance',
+        'image': maintenance_config.image,
+        'command': ['/bin/sh'],
+        'args': ['/scripts/maintenance.sh'],
+        'env': env,
+        'volume_mounts': [{'name': 'scripts', 'mount_path': '/scripts', 'read_only': True}],
+    }
+    if maintenance_config.resources is not None:
+        container['resources'] = maintenance_config.resources.to_resource_requirements()
+
+    return k8s.batch.v1.CronJob(
+        name,
+        metadata={'name': name, 'namespace': namespace_name},
+        spec={
+            'schedule': maintenance_config.schedule,
+            # REINDEX CONCURRENTLY of two runs on the same index would fail
+            'concurrency_policy': 'Forbid',
+            'job_template': {
+                'spec': {
+                    'backoff_limit': 1,
+                    'template': {
+                        'spec': {
+                            'restart_policy': 'Never',
+                            'security_context': {
+                                'run_as_non_root': True,
+                                # postgres user of the Alpine image
+                                'run_as_user': 70,
+                            },
+                            'containers': [container],
+                            'volumes': [
+                                {
+                                    'name': 'scripts',
+                                    'config_map': {
+                                        'name': script_config_map.metadata.name,
+                                        'default_mode': 0o755,
+                                    },
+                                },
+                            ],
+                        },
+                    },
+                },
+            },
+        },
+        opts=k8s_opts,
+    )
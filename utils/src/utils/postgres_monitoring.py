@@ -0,0 +1,157 @@
+import textwrap
+
+import yaml
+
+# Queries run against every database of the cluster, CloudNativePG discovers them at runtime
+_ALL_DATABASES = ['*']
+
+
+def _label(description: str) -> dict:
+    return {'usage': 'LABEL', 'description': description}
+
+
+def _gauge(description: str) -> dict:
+    return {'usage': 'GAUGE', 'description': description}
+
+
+def _counter(description: str) -> dict:
+    return {'usage': 'COUNTER', 'description': description}
+
+
+def _statement_queries(top_statements: int) -> dict:
+    return {
+        'pg_stat_statements_top': {
+            'query': textwrap.dedent(
+                f"""\
+                SELECT
+                  d.datname,
+                  s.queryid::text AS queryid,
+                  left(regexp_replace(s.query, '\\s+', ' ', 'g'), 120) AS query,
+                  s.calls,
+                  s.total_exec_time / 1000 AS total_exec_seconds,
+                  s.mean_exec_time / 1000 AS mean_exec_seconds,
+                  s.rows,
+                  s.shared_blks_hit,
+                  s.shared_blks_read
+                FROM pg_stat_statements s
+                JOIN pg_database d ON d.oid = s.dbid
+                ORDER BY s.total_exec_time DESC
+                LIMIT {top_statements}
+                """
+            ),
+            'metrics': [
+                {'datname': _label('Database of the statement')},
+                {'queryid': _label('Query identifier')},
+                {'query': _label('Normalized query text, truncated')},
+                {'calls': _counter('Number of executions')},
+                {'total_exec_seconds': _counter('Total execution time')},
+                {'mean_exec_seconds': _gauge('Mean execution time')},
+                {'rows': _counter('Rows retrieved or affected')},
+                {'shared_blks_hit': _counter('Shared buffer hits')},
+                {'shared_blks_read': _counter('Shared blocks read from disk')},
+            ],
+        },
+    }
+
+
+_TABLE_QUERIES = {
+    'pg_cache_hit': {
+        'query': textwrap.dedent(
+            """\
+            SELECT
+              datname,
+              blks_hit,
+              blks_read,
+              CASE
+                WHEN blks_hit + blks_read = 0 THEN 1
+                ELSE blks_hit::float / (blks_hit + blks_read)
+              END AS ratio
+            FROM pg_stat_database
+            WHERE datname = current_database()
+            """
+        ),
+        'target_databases': _ALL_DATABASES,
+        'metrics': [
+            {'datname': _label('Name of the database')},
+            {'blks_hit': _counter('Blocks found in shared buffers')},
+            {'blks_read': _counter('Blocks read from disk')},
+            {'ratio': _gauge('Share of blocks found in shared buffers')},
+        ],
+    },
+    # Estimate based on dead tuples, cheap enough to scrape unlike pgstattuple
+    'pg_table_bloat': {
+        'query': textwrap.dedent(
+            """\
+            SELECT
+              current_database() AS datname,
+              schemaname,
+              relname,
+              pg_table_size(relid) AS size_bytes,
+              n_dead_tup::float / greatest(n_live_tup + n_dead_tup, 1) AS dead_ratio,
+              pg_table_size(relid) * n_dead_tup::float
+                / greatest(n_live_tup + n_dead_tup, 1) AS estimated_bloat_bytes
+            FROM pg_stat_user_tables
+            ORDER BY estimated_bloat_bytes DESC
+            LIMIT 20
+            """
+        ),
+        'target_databases': _ALL_DATABASES,
+        'metrics': [
+            {'datname': _label('Name of the database')},
+            {'schemaname': _label('Schema of the table')},
+            {'relname': _label('Name of the table')},
+            {'size_bytes': _gauge('Size of the table without indexes')},
+            {'dead_ratio': _gauge('Share of dead tuples')},
+            {'estimated_bloat_bytes': _gauge('Space estimated to be taken by dead tuples')},
+        ],
+    },
+    'pg_autovacuum_lag': {
+        'query': textwrap.dedent(
+            """\
+            SELECT
+              current_database() AS datname,
+              schemaname,
+              relname,
+              n_dead_tup - (
+                current_setting('autovacuum_vacuum_threshold')::float
+                + current_setting('autovacuum_vacuum_scale_factor')::float * n_live_tup
+              ) AS dead_tuples_over_threshold,
+              extract(
+                EPOCH FROM now() - greatest(last_vacuum, last_autovacuum, last_analyze)
+              ) AS seconds_since_vacuum
+            FROM pg_stat_user_tables
+            ORDER BY n_dead_tup DESC
+            LIMIT 20
+            """
+        ),
+        'target_databases': _ALL_DATABASES,
+        'metrics': [
+            {'datname': _label('Name of the database')},
+            {'schemaname': _label('Schema of the table')},
+            {'relname': _label('Name of the table')},
+            {
+                'dead_tuples_over_threshold': _gauge(
+                    'Dead tuples above the autovacuum threshold, positive values are overdue'
+                )
+            },
+            {'seconds_since_vacuum': _gauge('Time since the last vacuum or analyze')},
+        ],
+    },
+}
+
+
+def custom_queries(*, pg_stat_statements: bool, top_statements: int = 20) -> str:
+    """Build the CloudNativePG custom queries for query, cache and vacuum visibility.
+
+    Args:
+        pg_stat_statements: Whether to export the statements with the highest total time,
+            requires the pg_stat_statements extension in the postgres database.
+        top_statements: Number of statements to export.
+
+    Returns:
+        Content of the `queries.yaml` key referenced by `monitoring.customQueriesConfigMap`.
+    """
+    queries = dict(_TABLE_QUERIES)
+    if pg_stat_statements:
+        queries |= _statement_queries(top_statements)
+    return yaml.safe_dump(queries, sort_keys=False)
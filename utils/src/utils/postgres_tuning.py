@@ -0,0 +1,161 @@
+import math
+import re
+
+from utils.model import PostgresDurability, PostgresWorkload, ResourcesConfig
+
+_QUANTITY_SUFFIXES = {
+    '': 1,
+    'k': 1000,
+    'M': 1000**2,
+    'G': 1000**3,
+    'T': 1000**4,
+    'Ki': 1024,
+    'Mi': 1024**2,
+    'Gi': 1024**3,
+    'Ti': 1024**4,
+}
+
+# Units of PostgreSQL memory parameters, always powers of 1024
+_MEMORY_UNITS = {
+    'B': 1,
+    'kB': 1024,
+    'MB': 1024**2,
+    'GB': 1024**3,
+    'TB': 1024**4,
+}
+
+_MB = 1024**2
+
+# Fraction of the memory limit used for shared_buffers and effective_cache_size, max_connections
+# and an upper bound for max_parallel_workers_per_gather per workload.
+_WORKLOAD_PROFILES: dict[PostgresWorkload, dict[str, float]] = {
+    PostgresWorkload.OLTP: {
+        'shared_buffers': 0.25,
+        'effective_cache_size': 0.75,
+        'max_connections': 100,
+        'max_parallel_workers_per_gather': 2,
+    },
+    # Vector indexes are built and scanned in memory, favour maintenance and sort memory
+    PostgresWorkload.VECTOR: {
+        'shared_buffers': 0.25,
+        'effective_cache_size': 0.75,
+        'max_connections': 50,
+        'max_parallel_workers_per_gather': 4,
+    },
+    # Small services with few connections, leave memory to the OS
+    PostgresWorkload.LIGHT: {
+        'shared_buffers': 0.15,
+        'effective_cache_size': 0.5,
+        'max_connections': 30,
+        'max_parallel_workers_per_gather': 0,
+    },
+}
+
+
+# full_page_writes stays on in all tiers, CloudNativePG requires it for pg_rewind and backups and
+# turning it off risks torn pages instead of losing recent commits only.
+_DURABILITY_PARAMETERS: dict[PostgresDurability, dict[str, str]] = {
+    PostgresDurability.STRICT: {
+        'synchronous_commit': 'on',
+        'wal_writer_delay': '200ms',
+        'commit_delay': '0',
+        'checkpoint_timeout': '5min',
+    },
+    # Group commit: wait up to 1ms for other transactions to share a WAL flush
+    PostgresDurability.BALANCED: {
+        'synchronous_commit': 'on',
+        'wal_writer_delay': '200ms',
+        'commit_delay': '1000',
+        'commit_siblings': '5',
+        'checkpoint_timeout': '15min',
+    },
+    # Asynchronous commit, at most three times wal_writer_delay of commits are lost on a crash
+    PostgresDurability.FAST: {
+        'synchronous_commit': 'off',
+        'wal_writer_delay': '300ms',
+        'commit_delay': '0',
+        'checkpoint_timeout': '30min',
+    },
+}
+
+
+def durability_parameters(durability: PostgresDurability) -> dict[str, str]:
+    """Return the commit and checkpoint parameters of a durability tier."""
+    return dict(_DURABILITY_PARAMETERS[durability])
+
+
+def parse_quantity(quantity: str) -> float:
+    """Parse a Kubernetes quantity (e.g. '512Mi', '2G' or '500m') into a number."""
+    match = re.fullmatch(r'([0-9.]+)(m|k|[KMGT]i|[MGT])?', quantity.strip())
+    if not match:
+        raise ValueError(f'Invalid quantity: {quantity}')
+
+    value, suffix = float(match.group(1)), match.group(2) or ''
+    if suffix == 'm':
+        return value / 1000
+    return value * _QUANTITY_SUFFIXES[suffix]
+
+
+def parse_memory_parameter(value: str, default_unit: str = '8kB') -> float:
+    """Parse a PostgreSQL memory parameter (e.g. '256MB' or '1 GB') into bytes.
+
+    Values without unit are in the unit of the parameter, blocks of 8kB for shared_buffers.
+    """
+    match = re.fullmatch(r'([0-9.]+)\s*(B|kB|MB|GB|TB)?', value.strip())
+    if not match:
+        raise ValueError(f'Invalid memory parameter: {value}')
+
+    if match.group(2) is None:
+        return float(match.group(1)) * parse_memory_parameter(default_unit)
+    return float(match.group(1)) * _MEMORY_UNITS[match.group(2)]
+
+
+def _mb(value: float) -> str:
+    return f'{max(int(value), 1)}MB'
+
+
+def tune_parameters(resources: ResourcesConfig, workload: PostgresWorkload) -> dict[str, str]:
+    """Derive memory and parallelism parameters from the resources of a cluster.
+
+    Follows the usual pgtune rules of thumb, scaled by the workload profile.
+
+    Args:
+        resources: CPU request and memory limit of each PostgreSQL instance.
+        workload: Workload profile of the cluster.
+
+    Returns:
+        PostgreSQL parameters for the CloudNativePG cluster spec.
+    """
+    profile = _WORKLOAD_PROFILES[workload]
+    memory_mb = parse_quantity(resources.memory) / _MB
+    cpus = max(math.ceil(parse_quantity(resources.cpu)), 1)
+
+    max_connections = int(profile['max_connections'])
+    shared_buffers_mb = memory_mb * profile['shared_buffers']
+    parallel_workers_per_gather = min(
+        int(profile['max_parallel_workers_per_gather']), math.ceil(cpus / 2)
+    )
+
+    if workload == PostgresWorkload.VECTOR:
+        maintenance_work_mem_mb = min(memory_mb / 8, 4096)
+    else:
+        maintenance_work_mem_mb = min(memory_mb / 16, 2048)
+
+    # Each connection may use work_mem several times (sorts, hashes, parallel workers)
+    work_mem_mb = (memory_mb - shared_buffers_mb) / (
+        max_connections * 3 * max(parallel_workers_per_gather, 1)
+    )
+
+    return {
+        'max_connections': str(max_connections),
+        'shared_buffers': _mb(shared_buffers_mb),
+        'effective_cache_size': _mb(memory_mb * profile['effective_cache_size']),
+        'maintenance_work_mem': _mb(max(maintenance_work_mem_mb, 16)),
+        'work_mem': _mb(max(work_mem_mb, 4)),
+        # 3% of shared_buffers, capped at one WAL segment
+        'wal_buffers': _mb(min(max(shared_buffers_mb * 0.03, 1), 16)),
+        # Keep the default of 8 as lower bound, extensions and CloudNativePG use workers as well
+        'max_worker_processes': str(max(cpus, 8)),
+        'max_parallel_workers': str(cpus),
+        'max_parallel_workers_per_gather': str(parallel_workers_per_gather),
+    }
@@ -0,0 +1,47 @@
+import textwrap
+
+# Shell functions turning the summary message of `restic backup --json` into metrics, so every
+# backup script reports the same schema. Requires the functions of utils.otlp:
+#
+#   push_restic_summary <service.name> <key=value,...> <summary JSON line> [<metric=value> ...]
+#
+# Without summary, e.g. because restic failed, only restic_backup_success=0 is pushed.
+RESTIC_SUMMARY_FUNCTIONS = textwrap.dedent(
+    """\
+    json_number() {
+        value=$(echo "$2" | sed -n "s/.*\\"$1\\": *\\([0-9.eE+-]*\\).*/\\1/p")
+        echo "${value:-0}"
+    }
+
+    push_restic_summary() {
+        service="$1"
+        labels="$2"
+        summary="$3"
+        shift 3
+        if [ -z "$summary" ]; then
+            push_metrics "$service" "$labels" restic_backup_success=0 "$@"
+            return
+        fi
+
+        duration=$(json_number total_duration "$summary")
+        processed=$(json_number total_bytes_processed "$summary")
+        added=$(json_number data_added "$summary")
+        push_metrics "$service" "$labels" \\
+            restic_backup_success=1 \\
+            "restic_backup_last_success_timestamp_seconds=$(date +%s)" \\
+            "restic_backup_duration_seconds=$duration" \\
+            "restic_backup_processed_bytes=$processed" \\
+            "restic_backup_processed_files=$(json_number total_files_processed "$summary")" \\
+            "restic_backup_added_bytes=$added" \\
+            "restic_backup_added_packed_bytes=$(json_number data_added_packed "$summary")" \\
+            "restic_backup_files_new=$(json_number files_new "$summary")" \\
+            "restic_backup_files_changed=$(json_number files_changed "$summary")" \\
+            "restic_backup_files_unmodified=$(json_number files_unmodified "$summary")" \\
+            "restic_backup_throughput_bytes_per_second=$(awk -v bytes="$processed" \\
+                -v seconds="$duration" 'BEGIN { print (seconds > 0 ? bytes / seconds : 0) }')" \\
+            "restic_backup_dedup_ratio=$(awk -v added="$added" -v bytes="$processed" \\
+                'BEGIN { print (bytes > 0 ? 1 - added / bytes : 1) }')" \\
+            "$@"
+    }
+    """
+)
@@ -1,17 +1,73 @@
+import hashlib
 import pathlib
 
 import pulumi as p
 
+from utils.cache import JsonFileCache
 
-def directory_content(path: pathlib.Path) -> list[str]:
+# Read files in chunks so large (binary) assets are never held in memory as a whole
+_DIGEST_CHUNK_SIZE = 1024 * 1024
+
+# Per-file digests keyed by directory, reused as long as mtime and size are unchanged
+_file_digest_cache = JsonFileCache('file-digests')
+
+
+def _file_digest(path: pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as file:
+        while chunk := file.read(_DIGEST_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def directory_manifest(path: pathlib.Path) -> dict[str, str]:
+    """
+    Computes the SHA-256 digest of every file in a directory.
+
+    Returns:
+        Mapping of the POSIX path relative to `path` to the hex digest of the file.
+    """
+    cache_key = str(path.resolve())
+    cache_entry = _file_digest_cache.get_entry(cache_key)
+    cached: dict[str, list] = cache_entry['value'] if cache_entry else {}
+
+    manifest = {}
+    stats = {}
+    for file in sorted(path.rglob('*')):
+        if not file.is_file():
+            continue
+
+        relative_path = file.relative_to(path).as_posix()
+        stat = file.stat()
+        mtime_ns, size = stat.st_mtime_ns, stat.st_size
+
+        cached_stat = cached.get(relative_path)
+        if cached_stat and cached_stat[:2] == [mtime_ns, size]:
+            digest = cached_stat[2]
+        else:
+            digest = _file_digest(file)
+
+        manifest[relative_path] = digest
+        stats[relative_path] = [mtime_ns, size, digest]
+
+    if stats != cached:
+        _file_digest_cache.set(cache_key, stats)
+
+    return manifest
+
+
+def directory_digest(path: pathlib.Path) -> str:
     """
     Hashes the contents of a directory.
+
+    The result is the root of a Merkle-style manifest: the SHA-256 over the sorted relative paths
+    and per-file digests. Renames, content and binary changes all change the digest, while the
+    value stored e.g. in command triggers stays a single short string.
     """
-    contents = []
-    for file in path.rglob('*'):
-        if file.is_file():
-            contents.append(file.read_text())
-    return contents
+    digest = hashlib.sha256()
+    for relative_path, file_digest in directory_manifest(path).items():
+        digest.update(f'{relative_path}\0{file_digest}\n'.encode())
+    return digest.hexdigest()
 
 
 def stack_is_prod() -> bool:
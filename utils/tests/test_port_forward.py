@@ -0,0 +1,139 @@
+import os
+import pathlib
+import shutil
+import socket
+import socketserver
+import sys
+import tempfile
+import textwrap
+import threading
+import unittest
+
+from utils.port_forward import PortForwardError, PortForwardManager, ResourceType
+
+# Stands in for `kubectl port-forward`, forwards the local port to a port on localhost
+_FAKE_KUBECTL = textwrap.dedent(
+    """\
+    import socket
+    import sys
+    import threading
+
+
+    def pump(source, target):
+        while data := source.recv(65536):
+            target.sendall(data)
+        target.shutdown(socket.SHUT_WR)
+
+
+    def handle(client, target_port):
+        with client, socket.create_connection(('localhost', target_port)) as upstream:
+            thread = threading.Thread(target=pump, args=(upstream, client))
+            thread.start()
+            pump(client, upstream)
+            thread.join()
+
+
+    try:
+        local_port, target_port = map(int, sys.argv[-1].split(':'))
+    except ValueError:
+        sys.exit(f'error: invalid port mapping {sys.argv[-1]}')
+    with socket.create_server(('localhost', local_port)) as server:
+        print(f'Forwarding from 127.0.0.1:{local_port} -> {target_port}', flush=True)
+        while True:
+            client, _ = server.accept()
+            threading.Thread(target=handle, args=(client, target_port), daemon=True).start()
+    """
+)
+
+
+class _EchoHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while data := self.request.recv(65536):
+            self.request.sendall(data)
+
+
+def _roundtrip(port: int, payload: bytes) -> bytes:
+    with socket.create_connection(('localhost', port), timeout=10) as connection:
+
+        def send():
+            connection.sendall(payload)
+            connection.shutdown(socket.SHUT_WR)
+
+        sender = threading.Thread(target=send)
+        sender.start()
+        received = bytearray()
+        while data := connection.recv(65536):
+            received += data
+        sender.join()
+        return bytes(received)
+
+
+class PortForwardManagerTest(unittest.TestCase):
+    def setUp(self):
+        bin_dir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, bin_dir)
+        kubectl = bin_dir / 'kubectl'
+        kubectl.write_text(f'#!{sys.executable}\n{_FAKE_KUBECTL}')
+        kubectl.chmod(0o755)
+        path = os.environ['PATH']
+        os.environ['PATH'] = f'{bin_dir}{os.pathsep}{path}'
+        self.addCleanup(os.environ.__setitem__, 'PATH', path)
+
+        self.echo = socketserver.ThreadingTCPServer(('localhost', 0), _EchoHandler)
+        self.echo.daemon_threads = True
+        threading.Thread(target=self.echo.serve_forever, daemon=True).start()
+        self.addCleanup(self.echo.server_close)
+        self.addCleanup(self.echo.shutdown)
+
+        self.manager = PortForwardManager(timeout_seconds=10)
+        self.addCleanup(self.manager.close)
+
+    def forward(self, **kwargs) -> int:
+        return self.manager.forward(
+            'kubeconfig',
+            'default',
+            ResourceType.SERVICE,
+            'database',
+            self.echo.server_address[1],
+            **kwargs,
+        )
+
+    def test_transfers_more_than_a_window(self):
+        port = self.forward()
+        payload = os.urandom(4 * 1024 * 1024)
+
+        self.assertEqual(_roundtrip(port, payload), payload)
+
+    def test_shares_forwards(self):
+        port = self.forward()
+
+        self.assertEqual(self.forward(), port)
+        self.assertEqual(len(self.manager._forwards), 1)  # noqa: SLF001
+
+    def test_replaces_exited_forward(self):
+        self.forward()
+        (forward,) = self.manager._forwards.values()  # noqa: SLF001
+        forward.process.kill()
+        forward.process.wait()
+
+        self.assertEqual(_roundtrip(self.forward(), b'ping'), b'ping')
+        self.assertIsNot(next(iter(self.manager._forwards.values())), forward)  # noqa: SLF001
+
+    def test_close_stops_forwards(self):
+        port = self.forward()
+        (forward,) = self.manager._forwards.values()  # noqa: SLF001
+
+        self.manager.close()
+
+        self.assertIsNotNone(forward.process.poll())
+        with self.assertRaises(OSError):
+            socket.create_connection(('localhost', port), timeout=1).close()
+        self.assertEqual(_roundtrip(self.forward(), b'ping'), b'ping')
+
+    def test_reports_exited_kubectl(self):
+        with self.assertRaises(PortForwardError):
+            self.manager.forward('kubeconfig', 'default', ResourceType.POD, 'database', 'invalid')
+
+
+if __name__ == '__main__':
+    unittest.main()